@@ -0,0 +1,260 @@
+"""
+Checkpoint of a parameter search in out/n/.
+
+All results of a parameter set are kept in a single binary file,
+out/n/checkpoint.dat, instead of one .npy file per quantity and per
+improvement. The file starts with a header of four int64,
+
+    magic, n_gene, count_num, reserved
+
+followed by one float64 record per improvement of the best individual,
+
+    generation, best_fitness, best_individual[0], ..., best_individual[n_gene - 1]
+
+Records are only appended, so the file can be memory-mapped by readers
+while the search is running. Writes are buffered and flushed together
+every `flush_interval` seconds and when the search stops.
+
+With each flush, the state of the genetic algorithm, i.e., the whole
+population, the adaptation counters of ga_v2 and the state of the random
+number generator, is saved in out/n/population.npz, from which
+optimize_continue resumes the search exactly.
+"""
+import os
+import struct
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+__all__ = [
+    "CHECKPOINT",
+    "POPULATION",
+    "Checkpoint",
+    "CheckpointWriter",
+    "PopulationState",
+    "load_checkpoint",
+    "load_population",
+]
+
+CHECKPOINT = "checkpoint.dat"
+POPULATION = "population.npz"
+
+_MAGIC = int.from_bytes(b"BIOMASS1", "little")
+_HEADER = struct.Struct("<4q")
+
+
+class Checkpoint(object):
+    """
+    Read-only view of a checkpoint file.
+
+    Parameters
+    ----------
+    path : str
+        Path to checkpoint.dat.
+
+    Attributes
+    ----------
+    n_gene : int
+        The number of estimated parameters and initial values.
+
+    count_num : int
+        The number of generations completed.
+
+    records : numpy array
+        Memory-mapped records, shape (n_records, n_gene + 2).
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            (magic, n_gene, count_num, _) = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file.")
+        self.n_gene: int = n_gene
+        self.count_num: int = count_num
+        n_records = (os.path.getsize(path) - _HEADER.size) // (8 * (n_gene + 2))
+        if n_records > 0:
+            self.records: np.ndarray = np.memmap(
+                path, dtype="<f8", mode="r", offset=_HEADER.size, shape=(n_records, n_gene + 2)
+            )
+        else:
+            self.records = np.empty((0, n_gene + 2))
+
+    @property
+    def best_generation(self) -> int:
+        """Generation at which the current best individual was found."""
+        return int(self.records[-1, 0])
+
+    @property
+    def best_fitness(self) -> float:
+        """Objective value of the best individual."""
+        return float(self.records[-1, 1])
+
+    @property
+    def best_individual(self) -> np.ndarray:
+        """Parameter values of the best individual."""
+        return np.array(self.records[-1, 2:])
+
+
+def load_checkpoint(out_dir: str) -> Optional[Checkpoint]:
+    """Checkpoint in `out_dir`, or None if it has no result yet."""
+    path = os.path.join(out_dir, CHECKPOINT)
+    if not os.path.isfile(path):
+        return None
+    checkpoint = Checkpoint(path)
+    return checkpoint if len(checkpoint.records) > 0 else None
+
+
+class PopulationState(NamedTuple):
+    """State of ga_v2 after `generation` generations."""
+
+    generation: int
+    population: np.ndarray
+    n_iter: int
+    n0: np.ndarray
+    random_state: tuple
+
+
+def load_population(out_dir: str) -> Optional[PopulationState]:
+    """Population saved in `out_dir`, or None if it has not been saved."""
+    path = os.path.join(out_dir, POPULATION)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as f:
+        return PopulationState(
+            int(f["generation"]),
+            f["population"],
+            int(f["n_iter"]),
+            f["n0"],
+            (
+                str(f["rng_name"]),
+                f["rng_keys"],
+                int(f["rng_pos"]),
+                int(f["rng_has_gauss"]),
+                float(f["rng_cached_gaussian"]),
+            ),
+        )
+
+
+class CheckpointWriter(object):
+    """
+    Writer of a checkpoint file.
+
+    Parameters
+    ----------
+    path : str
+        Path to checkpoint.dat.
+
+    n_gene : int
+        The number of estimated parameters and initial values.
+
+    resume : bool (default: False)
+        If True, append to an existing file instead of creating a new one.
+
+    flush_interval : float (default: 10.0)
+        Seconds between writes to the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        n_gene: int,
+        resume: bool = False,
+        flush_interval: float = 10.0,
+    ) -> None:
+        self.n_gene = n_gene
+        self.flush_interval = flush_interval
+        self._count_num = 0
+        self._buffer = []
+        self._state: Optional[PopulationState] = None
+        if resume and os.path.isfile(path):
+            checkpoint = Checkpoint(path)
+            if checkpoint.n_gene != n_gene:
+                raise ValueError(f"{path} has {checkpoint.n_gene:d} genes, not {n_gene:d}.")
+            self._count_num = checkpoint.count_num
+            self._file = open(path, "r+b")
+            # Discard a record left incomplete by an interrupted write.
+            self._file.truncate(_HEADER.size + checkpoint.records.nbytes)
+        else:
+            self._file = open(path, "w+b")
+            self._file.write(_HEADER.pack(_MAGIC, n_gene, 0, 0))
+            self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self) -> "CheckpointWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def save_best(self, generation: int, best_fitness: float, best_individual: np.ndarray) -> None:
+        """Record a new best individual."""
+        record = np.empty(self.n_gene + 2, dtype="<f8")
+        record[0] = generation
+        record[1] = best_fitness
+        record[2:] = best_individual
+        self._buffer.append(record)
+        self._count_num = max(self._count_num, generation)
+        self._maybe_flush()
+
+    def save_state(
+        self, generation: int, population: np.ndarray, n_iter: int, n0: np.ndarray
+    ) -> None:
+        """Record the state of ga_v2 after `generation` generations."""
+        self._state = PopulationState(
+            generation, population.copy(), n_iter, n0.copy(), np.random.get_state()
+        )
+
+    def save_count(self, count_num: int) -> None:
+        """Record the number of generations completed."""
+        self._count_num = count_num
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records and the generation count to the file."""
+        if self._state is not None:
+            self._write_state()
+        if self._buffer:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(np.stack(self._buffer).tobytes())
+            self._buffer.clear()
+        # The count is updated after the records it refers to.
+        self._file.seek(2 * 8)
+        self._file.write(struct.pack("<q", self._count_num))
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def _write_state(self) -> None:
+        path = os.path.join(os.path.dirname(self._file.name), POPULATION)
+        (
+            rng_name,
+            rng_keys,
+            rng_pos,
+            rng_has_gauss,
+            rng_cached_gaussian,
+        ) = self._state.random_state
+        # Replaced at once, so that an interrupted write leaves the previous state.
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                generation=self._state.generation,
+                population=self._state.population,
+                n_iter=self._state.n_iter,
+                n0=self._state.n0,
+                rng_name=rng_name,
+                rng_keys=rng_keys,
+                rng_pos=rng_pos,
+                rng_has_gauss=rng_has_gauss,
+                rng_cached_gaussian=rng_cached_gaussian,
+            )
+        os.replace(path + ".tmp", path)
+        self._state = None
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
@@ -1,19 +1,22 @@
 """BioMASS core functions"""
-import multiprocessing
+import copy
+import functools
 import os
 import warnings
-from typing import Any, Dict, List, NoReturn, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, NoReturn, Optional, Type, Union
 
 from .analysis import InitialConditionSensitivity, ParameterSensitivity, ReactionSensitivity
 from .dynamics import SignalingSystems
 from .estimation import GeneticAlgorithmContinue, GeneticAlgorithmInit
+from .estimation.broker import Broker, work
+from .estimation.ga.evaluation import EVALUATORS
+from .estimation.pool import WorkerPool
 from .template import BioMassModel
 
 __all__ = ["optimize", "optimize_continue", "run_simulation", "run_analysis"]
 
 
 def _check_optional_arguments(
-    end: Optional[int],
     options: Optional[Dict[str, Any]],
 ) -> Optional[NoReturn]:
     if options is not None:
@@ -22,22 +25,96 @@ def _check_optional_arguments(
                 f"'{options['local_search_method']}': "
                 "Invalid local_search_method. Should be one of ['mutation', 'Powell', 'DE']"
             )
-        elif (
-            isinstance(end, int)
-            and options["local_search_method"].lower() == "de"
-            and options["workers"] != 1
-        ):
-            raise AssertionError(
-                "daemonic processes are not allowed to have children. Set options['workers'] to 1."
+        elif not callable(options["evaluator"]) and options["evaluator"] not in EVALUATORS:
+            raise ValueError(
+                f"'{options['evaluator']}': "
+                f"Invalid evaluator. Should be one of {EVALUATORS} or callable"
             )
     return None
 
 
+def _run_ga(
+    ga_class: Type[Union[GeneticAlgorithmInit, GeneticAlgorithmContinue]],
+    options: Dict[str, Any],
+    model: BioMassModel,
+    nth_paramset: int,
+) -> None:
+    ga_class(model, **options).run(nth_paramset)
+
+
+def _run_claimed(
+    ga: Union[GeneticAlgorithmInit, GeneticAlgorithmContinue],
+    nth_paramset: int,
+    attempt: int,
+) -> None:
+    if attempt > 1 and isinstance(ga, GeneticAlgorithmInit):
+        # Restart the parameter set left by a failed worker.
+        ga = copy.copy(ga)
+        ga.overwrite = True
+    ga.run(nth_paramset)
+
+
+def _work(
+    ga_class: Type[Union[GeneticAlgorithmInit, GeneticAlgorithmContinue]],
+    options: Dict[str, Any],
+    broker: Broker,
+    model: BioMassModel,
+    _: int,
+) -> None:
+    work(broker, functools.partial(_run_claimed, ga_class(model, **options)))
+
+
+def _distribute(
+    model: BioMassModel,
+    pool: Optional[WorkerPool],
+    job: Callable[[BioMassModel, Any], None],
+    items: Optional[Iterable] = None,
+) -> None:
+    """Run job(model, item) in a pool; one item per worker if `items` is None."""
+    if pool is None:
+        with WorkerPool(model) as pool:
+            _distribute(model, pool, job, items)
+    elif pool.model is not model:
+        raise ValueError("pool must be created with the same model.")
+    else:
+        pool.map(job, range(pool.workers) if items is None else items)
+
+
+def _run(
+    ga_class: Type[Union[GeneticAlgorithmInit, GeneticAlgorithmContinue]],
+    model: BioMassModel,
+    start: int,
+    end: Optional[int],
+    options: Dict[str, Any],
+    broker: Optional[Broker],
+    pool: Optional[WorkerPool],
+) -> None:
+    # Validates the options before any worker starts.
+    ga = ga_class(model, **options)
+    if broker is not None:
+        broker.put(range(int(start), int(start if end is None else end) + 1))
+        if end is None:
+            work(broker, functools.partial(_run_claimed, ga))
+        else:
+            _distribute(model, pool, functools.partial(_work, ga_class, options, broker))
+    elif end is None:
+        ga.run(int(start))
+    else:
+        _distribute(
+            model,
+            pool,
+            functools.partial(_run_ga, ga_class, options),
+            range(int(start), int(end) + 1),
+        )
+
+
 def optimize(
     model: BioMassModel,
     start: int,
     end: Optional[int] = None,
     options: Optional[dict] = None,
+    broker: Optional[Broker] = None,
+    pool: Optional[WorkerPool] = None,
 ) -> None:
     """
     Run GA for parameter estimation.
@@ -78,14 +155,62 @@ def optimize(
             over which the entire population is evolved.
 
         workers : int (default: -1 if `end` is None else 1)
-            (method='DE') The population is subdivided into workers sections and
-            evaluated in parallel (uses multiprocessing.Pool). Supply -1 to use
-            all available CPU cores. Set workers to 1 when searching multiple
-            parameter sets simultaneously.
+            (method='DE' or evaluator='processes') The population is subdivided into
+            workers sections and evaluated in parallel (uses multiprocessing.Pool). Supply -1 to use
+            all available CPU cores. When searching multiple parameter sets
+            simultaneously, each worker of `pool` starts its own processes.
+
+        threads : int (default: 1)
+            The number of threads evaluating the objective function for the
+            initial population and, with method='mutation', the children of NDM.
+            Threads share the model in the same process, so nothing is pickled;
+            the integration runs in parallel while NumPy and SciPy release the
+            GIL. Supply -1 to use all available CPU cores.
+
+        evaluator : str or callable (default: 'threads')
+            How the objective function is evaluated for the initial population
+            and the children of NDM. Should be one of
+            - 'serial' : One by one.
+            - 'threads' : By `threads` threads.
+            - 'processes' : By `workers` processes (uses multiprocessing.Pool).
+            - 'batch' : Simulating all individuals together (model.obj_func_batch).
+            A callable taking the genes of individuals, shape (n, len(search_param)),
+            and returning their objective values is also accepted.
+
+        early_rejection : bool (default: False)
+            (method='mutation') Stop evaluating a child of NDM as soon as its
+            objective value exceeds that of the parent it would replace
+            (`bound` of the objective function of the model). Experimental
+            conditions are then simulated one by one, which is only possible
+            without normalization and condition_tree. A callable evaluator is
+            called with the keyword argument `bound`.
 
         overwrite : bool (default: False)
             If True, the out/n folder will be overwritten.
 
+        islands : int (default: 1)
+            The number of processes among which the population is split (island
+            model). Each island evolves popsize * len(search_param) / islands
+            individuals.
+
+        migration_interval : int (default: 10)
+            (islands > 1) The number of generations between migrations.
+
+        migration_size : int (default: 1)
+            (islands > 1) The number of elites sent to the next island at each
+            migration, replacing its worst individuals.
+
+    broker : biomass.estimation.broker.Broker, optional
+        Work queue of the indices from `start` to `end`. Each worker process
+        of this call, and of the same call on other nodes sharing the queue,
+        claims the next index until all of them are done. Indices claimed by
+        a worker that fails are estimated again by another one.
+
+    pool : biomass.estimation.pool.WorkerPool, optional
+        Processes of `model` running the parameter sets from `start` to `end`,
+        which can be reused by subsequent calls. If None, a pool of
+        (the number of CPU cores - 1) workers is created for this call.
+
     Example
     -------
     >>> from biomass.models import Nakakuki_Cell_2010
@@ -109,18 +234,17 @@ def optimize(
     options.setdefault("n_children", 200)
     options.setdefault("maxiter", 10)
     options.setdefault("workers", -1 if end is None else 1)
+    options.setdefault("threads", 1)
+    options.setdefault("evaluator", "threads")
+    options.setdefault("early_rejection", False)
     options.setdefault("overwrite", False)
+    options.setdefault("islands", 1)
+    options.setdefault("migration_interval", 10)
+    options.setdefault("migration_size", 1)
 
-    _check_optional_arguments(end, options)
+    _check_optional_arguments(options)
 
-    ga_init = GeneticAlgorithmInit(model, **options)
-    if end is None:
-        ga_init.run(int(start))
-    else:
-        n_proc = max(1, multiprocessing.cpu_count() - 1)
-        p = multiprocessing.Pool(processes=n_proc)
-        p.map(ga_init.run, range(int(start), int(end) + 1))
-        p.close()
+    _run(GeneticAlgorithmInit, model, start, end, options, broker, pool)
 
 
 def optimize_continue(
@@ -128,6 +252,8 @@ def optimize_continue(
     start: int,
     end: Optional[int] = None,
     options: Optional[dict] = None,
+    broker: Optional[Broker] = None,
+    pool: Optional[WorkerPool] = None,
 ) -> None:
     """
     Continue running GA from where you stopped in the last parameter search.
@@ -168,10 +294,35 @@ def optimize_continue(
             over which the entire population is evolved.
 
         workers : int (default: -1 if `end` is None else 1)
-            (method='DE') The population is subdivided into workers sections and
-            evaluated in parallel (uses multiprocessing.Pool). Supply -1 to use
-            all available CPU cores. Set workers to 1 when searching multiple
-            parameter sets simultaneously.
+            (method='DE' or evaluator='processes') The population is subdivided into
+            workers sections and evaluated in parallel (uses multiprocessing.Pool). Supply -1 to use
+            all available CPU cores. When searching multiple parameter sets
+            simultaneously, each worker of `pool` starts its own processes.
+
+        threads : int (default: 1)
+            The number of threads evaluating the objective function for the
+            initial population and, with method='mutation', the children of NDM.
+            Threads share the model in the same process, so nothing is pickled;
+            the integration runs in parallel while NumPy and SciPy release the
+            GIL. Supply -1 to use all available CPU cores.
+
+        evaluator : str or callable (default: 'threads')
+            How the objective function is evaluated for the initial population
+            and the children of NDM. Should be one of
+            - 'serial' : One by one.
+            - 'threads' : By `threads` threads.
+            - 'processes' : By `workers` processes (uses multiprocessing.Pool).
+            - 'batch' : Simulating all individuals together (model.obj_func_batch).
+            A callable taking the genes of individuals, shape (n, len(search_param)),
+            and returning their objective values is also accepted.
+
+        early_rejection : bool (default: False)
+            (method='mutation') Stop evaluating a child of NDM as soon as its
+            objective value exceeds that of the parent it would replace
+            (`bound` of the objective function of the model). Experimental
+            conditions are then simulated one by one, which is only possible
+            without normalization and condition_tree. A callable evaluator is
+            called with the keyword argument `bound`.
 
         p0_bounds : list of floats (default: [0.1, 10.0])
             Generate initial population using best parameter values in the last
@@ -179,6 +330,17 @@ def optimize_continue(
                 - lower_bound = po_bounds[0] * best_parameter_value
                 - upper_bound = p0_bounds[1] * best_parameter_value
 
+    broker : biomass.estimation.broker.Broker, optional
+        Work queue of the indices from `start` to `end`. Each worker process
+        of this call, and of the same call on other nodes sharing the queue,
+        claims the next index until all of them are done. Indices claimed by
+        a worker that fails are estimated again by another one.
+
+    pool : biomass.estimation.pool.WorkerPool, optional
+        Processes of `model` running the parameter sets from `start` to `end`,
+        which can be reused by subsequent calls. If None, a pool of
+        (the number of CPU cores - 1) workers is created for this call.
+
     Example
     -------
     >>> from biomass.models import Nakakuki_Cell_2010
@@ -202,18 +364,14 @@ def optimize_continue(
     options.setdefault("n_children", 200)
     options.setdefault("maxiter", 10)
     options.setdefault("workers", -1 if end is None else 1)
+    options.setdefault("threads", 1)
+    options.setdefault("evaluator", "threads")
+    options.setdefault("early_rejection", False)
     options.setdefault("p0_bounds", [0.1, 10.0])
 
-    _check_optional_arguments(end, options)
+    _check_optional_arguments(options)
 
-    ga_continue = GeneticAlgorithmContinue(model, **options)
-    if end is None:
-        ga_continue.run(int(start))
-    else:
-        n_proc = max(1, multiprocessing.cpu_count() - 1)
-        p = multiprocessing.Pool(processes=n_proc)
-        p.map(ga_continue.run, range(int(start), int(end) + 1))
-        p.close()
+    _run(GeneticAlgorithmContinue, model, start, end, options, broker, pool)
 
 
 def run_simulation(
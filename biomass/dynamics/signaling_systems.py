@@ -41,10 +41,16 @@ class SignalingSystems(TemporalDynamics):
             if len(n_file) > 0:
                 if len(n_file) == 1 and viz_type == "average":
                     raise ValueError(f"viz_type should be 'best', not '{viz_type}'.")
+                optimized = [self.load_param(nth_paramset) for nth_paramset in n_file]
+                simulations = self.model.sim.simulate_batch(
+                    [values.params for values in optimized],
+                    [values.initials for values in optimized],
+                )
                 for i, nth_paramset in enumerate(n_file):
-                    if self._validate(nth_paramset):
-                        for j, _ in enumerate(self.model.obs):
-                            simulations_all[j, i, :, :] = self.model.sim.simulations[j, :, :]
+                    if np.isnan(simulations[i]).all():
+                        print(f"Simulation failed. #{nth_paramset:d}\n")
+                    else:
+                        simulations_all[:, i, :, :] = simulations[i]
                 """
                 simulations_all : numpy array
                     All simulated values with estimated parameter sets.
@@ -59,22 +65,7 @@ class SignalingSystems(TemporalDynamics):
                 )
                 best_fitness_all = np.full(len(n_file), np.inf)
                 for i, nth_paramset in enumerate(n_file):
-                    if os.path.isfile(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            "best_fitness.npy",
-                        )
-                    ):
-                        best_fitness_all[i] = np.load(
-                            os.path.join(
-                                self.model.path,
-                                "out",
-                                f"{nth_paramset:d}",
-                                "best_fitness.npy",
-                            )
-                        )
+                    best_fitness_all[i] = self.get_best_fitness(nth_paramset)
                 best_paramset = n_file[np.argmin(best_fitness_all)]
                 self._write_best_fit_param(best_paramset)
                 if viz_type == "average":
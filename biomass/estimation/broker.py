@@ -0,0 +1,292 @@
+"""
+Work queue of parameter sets for distributed parameter estimation.
+
+Workers claim the index of a parameter set, renew the claim by heartbeats
+while estimating it, and mark it as done at the end. A claim that is not
+renewed within `timeout` seconds, e.g., because its node failed, expires
+and the index is handed to the next worker, so nodes can join or leave
+during a run without losing or duplicating parameter sets.
+
+Examples
+--------
+On one machine, the queue is an SQLite database:
+
+>>> optimize(model, start=1, end=500, broker=SQLiteBroker("queue.db"))
+
+For multiple hosts, serve a queue from one of them,
+
+>>> BrokerServer(SQLiteBroker("queue.db"), ("0.0.0.0", 5555)).serve_forever()
+
+and start the same parameter search on every node:
+
+>>> optimize(model, start=1, end=500, broker=SocketBroker(("head-node", 5555)))
+"""
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from typing import Callable, Iterable, Optional, Tuple
+
+__all__ = ["Broker", "SQLiteBroker", "SocketBroker", "BrokerServer", "work"]
+
+
+class Broker(ABC):
+    """Queue of indices of parameter sets."""
+
+    @abstractmethod
+    def put(self, indices: Iterable[int]) -> None:
+        """Add indices to the queue; indices already in the queue are ignored."""
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Tuple[int, int]]:
+        """
+        Claim a pending or expired index.
+
+        Returns
+        -------
+        claim : tuple of int or None
+            The index and the number of times it has been claimed, or None if
+            no index is available now.
+        """
+
+    @abstractmethod
+    def heartbeat(self, worker: str, index: int) -> bool:
+        """Renew a claim; False if the claim expired and was given to another worker."""
+
+    @abstractmethod
+    def release(self, worker: str, index: int, done: bool) -> None:
+        """Mark a claimed index as done, or return it to the queue."""
+
+    @abstractmethod
+    def finished(self) -> bool:
+        """Whether all indices in the queue are done."""
+
+
+class SQLiteBroker(Broker):
+    """
+    Queue stored in an SQLite database, shared by the processes of a machine.
+
+    Parameters
+    ----------
+    path : str
+        Path to the database file, created if it does not exist.
+
+    timeout : float (default: 60.0)
+        Seconds after the last heartbeat at which a claim expires.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0) -> None:
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        with closing(self._connect()) as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "idx INTEGER PRIMARY KEY, "
+                "state TEXT NOT NULL DEFAULT 'pending', "
+                "worker TEXT, "
+                "heartbeat REAL, "
+                "attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "timeout": self.timeout}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; transactions are started explicitly with BEGIN IMMEDIATE.
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    def put(self, indices: Iterable[int]) -> None:
+        with closing(self._connect()) as con:
+            con.executemany(
+                "INSERT OR IGNORE INTO queue (idx) VALUES (?)", [(int(i),) for i in indices]
+            )
+
+    def claim(self, worker: str) -> Optional[Tuple[int, int]]:
+        with closing(self._connect()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute(
+                "SELECT idx, attempts FROM queue WHERE state = 'pending' "
+                "OR (state = 'running' AND heartbeat < ?) ORDER BY idx LIMIT 1",
+                (time.time() - self.timeout,),
+            ).fetchone()
+            if row is not None:
+                con.execute(
+                    "UPDATE queue SET state = 'running', worker = ?, heartbeat = ?, "
+                    "attempts = attempts + 1 WHERE idx = ?",
+                    (worker, time.time(), row[0]),
+                )
+            con.execute("COMMIT")
+        return None if row is None else (row[0], row[1] + 1)
+
+    def heartbeat(self, worker: str, index: int) -> bool:
+        with closing(self._connect()) as con:
+            cur = con.execute(
+                "UPDATE queue SET heartbeat = ? "
+                "WHERE idx = ? AND worker = ? AND state = 'running'",
+                (time.time(), int(index), worker),
+            )
+            return cur.rowcount == 1
+
+    def release(self, worker: str, index: int, done: bool) -> None:
+        with closing(self._connect()) as con:
+            con.execute(
+                "UPDATE queue SET state = ?, worker = NULL "
+                "WHERE idx = ? AND worker = ? AND state = 'running'",
+                ("done" if done else "pending", int(index), worker),
+            )
+
+    def finished(self) -> bool:
+        with closing(self._connect()) as con:
+            (n_left,) = con.execute("SELECT COUNT(*) FROM queue WHERE state != 'done'").fetchone()
+        return n_left == 0
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                result = getattr(self.server.broker, request["method"])(*request["args"])
+                response = {"result": result}
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+
+
+class BrokerServer(socketserver.ThreadingTCPServer):
+    """
+    Serve a broker to workers on other hosts (see SocketBroker).
+
+    Parameters
+    ----------
+    broker : Broker
+        The queue to serve, e.g., SQLiteBroker.
+
+    address : tuple
+        (host, port) to listen on.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, broker: Broker, address: Tuple[str, int]) -> None:
+        self.broker = broker
+        super().__init__(address, _Handler)
+
+
+class SocketBroker(Broker):
+    """
+    Client of a BrokerServer.
+
+    Parameters
+    ----------
+    address : tuple
+        (host, port) of the server.
+
+    timeout : float (default: 30.0)
+        Seconds to wait for the server.
+    """
+
+    def __init__(self, address: Tuple[str, int], timeout: float = 30.0) -> None:
+        self.address = tuple(address)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __getstate__(self) -> dict:
+        return {"address": self.address, "timeout": self.timeout}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _call(self, method: str, *args):
+        # One connection per thread, as heartbeats are sent from another thread.
+        stream = getattr(self._local, "stream", None)
+        if stream is None:
+            conn = socket.create_connection(self.address, timeout=self.timeout)
+            stream = self._local.stream = conn.makefile("rwb")
+        stream.write((json.dumps({"method": method, "args": args}) + "\n").encode())
+        stream.flush()
+        line = stream.readline()
+        if not line:
+            self._local.stream = None
+            raise ConnectionError(f"Broker at {self.address} closed the connection.")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def put(self, indices: Iterable[int]) -> None:
+        self._call("put", [int(i) for i in indices])
+
+    def claim(self, worker: str) -> Optional[Tuple[int, int]]:
+        claim = self._call("claim", worker)
+        return None if claim is None else tuple(claim)
+
+    def heartbeat(self, worker: str, index: int) -> bool:
+        return self._call("heartbeat", worker, int(index))
+
+    def release(self, worker: str, index: int, done: bool) -> None:
+        self._call("release", worker, int(index), bool(done))
+
+    def finished(self) -> bool:
+        return self._call("finished")
+
+
+def work(
+    broker: Broker,
+    job: Callable[[int, int], None],
+    interval: Optional[float] = None,
+) -> None:
+    """
+    Run jobs for the indices in a queue until all of them are done.
+
+    Parameters
+    ----------
+    broker : Broker
+        The queue.
+
+    job : callable f(index, attempt)
+        Processes an index; `attempt` is 1 unless the index was claimed
+        before by a worker that failed.
+
+    interval : float, optional
+        Seconds between heartbeats and between polls of an empty queue
+        (default: a third of the timeout of the broker).
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if interval is None:
+        interval = getattr(broker, "timeout", 60.0) / 3
+    while not broker.finished():
+        claim = broker.claim(worker)
+        if claim is None:
+            # Other workers are still running; their indices return if they fail.
+            time.sleep(interval)
+            continue
+        (index, attempt) = claim
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(interval):
+                broker.heartbeat(worker, index)
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        try:
+            job(index, attempt)
+        except BaseException:
+            stop.set()
+            heartbeat.join()
+            broker.release(worker, index, done=False)
+            raise
+        stop.set()
+        heartbeat.join()
+        broker.release(worker, index, done=True)
@@ -0,0 +1,115 @@
+"""
+Evaluation of the objective function for many individuals at once.
+
+An evaluator takes the genes of individuals, shape (n_individuals, n_gene),
+and returns their objective values, shape (n_individuals,). With
+`bound`, objective values above it may be returned as lower bounds (see
+the objective function of a model).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+EVALUATORS = ["serial", "threads", "processes", "batch"]
+
+
+def _bounded(obj_func: Callable[..., float], bound: Optional[float]) -> Callable[..., float]:
+    return obj_func if bound is None else partial(obj_func, bound=bound)
+
+
+@dataclass(frozen=True)
+class SerialEvaluator(object):
+    """Evaluate individuals one by one."""
+
+    obj_func: Callable[[np.ndarray], float]
+
+    def __call__(self, genes: np.ndarray, bound: Optional[float] = None) -> np.ndarray:
+        obj_func = _bounded(self.obj_func, bound)
+        return np.array([obj_func(gene) for gene in genes], dtype=float)
+
+
+@dataclass(frozen=True)
+class ThreadEvaluator(object):
+    """Evaluate individuals by a pool of threads sharing the model."""
+
+    obj_func: Callable[[np.ndarray], float]
+    threads: int
+
+    def __call__(self, genes: np.ndarray, bound: Optional[float] = None) -> np.ndarray:
+        max_workers = os.cpu_count() if self.threads == -1 else self.threads
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(genes))) as executor:
+            return np.fromiter(
+                executor.map(_bounded(self.obj_func, bound), genes), dtype=float, count=len(genes)
+            )
+
+
+@dataclass(frozen=True)
+class ProcessEvaluator(object):
+    """Evaluate individuals by a pool of processes (uses multiprocessing.Pool)."""
+
+    obj_func: Callable[[np.ndarray], float]
+    workers: int
+
+    def __call__(self, genes: np.ndarray, bound: Optional[float] = None) -> np.ndarray:
+        processes = os.cpu_count() if self.workers == -1 else self.workers
+        with multiprocessing.Pool(processes=min(processes, len(genes))) as p:
+            return np.array(p.map(_bounded(self.obj_func, bound), genes), dtype=float)
+
+
+@dataclass(frozen=True)
+class BatchEvaluator(object):
+    """Simulate all individuals together (see NumericalSimulation.simulate_batch).
+
+    `bound` is ignored, as all individuals are integrated at once.
+    """
+
+    obj_func_batch: Callable[[np.ndarray], np.ndarray]
+
+    def __call__(self, genes: np.ndarray, bound: Optional[float] = None) -> np.ndarray:
+        return np.asarray(self.obj_func_batch(genes), dtype=float)
+
+
+def get_evaluator(
+    model,
+    evaluator: Union[str, Callable[[np.ndarray], np.ndarray]],
+    threads: int,
+    workers: int,
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Evaluator of the objective function of a model.
+
+    Parameters
+    ----------
+    model : BioMassModel
+        Model for parameter estimation.
+
+    evaluator : str or callable
+        One of EVALUATORS, or a callable taking the genes of individuals and
+        returning their objective values.
+
+    threads : int
+        The number of threads (evaluator='threads').
+
+    workers : int
+        The number of processes (evaluator='processes').
+
+    """
+    if callable(evaluator):
+        return evaluator
+    elif evaluator == "threads" and threads != 1:
+        return ThreadEvaluator(model.obj_func, threads)
+    elif evaluator == "processes" and workers != 1:
+        return ProcessEvaluator(model.obj_func, workers)
+    elif evaluator == "batch":
+        return BatchEvaluator(model.obj_func_batch)
+    elif evaluator in EVALUATORS:
+        return SerialEvaluator(model.obj_func)
+    else:
+        raise ValueError(
+            f"'{evaluator}': Invalid evaluator. Should be one of {EVALUATORS} or callable"
+        )
@@ -0,0 +1,86 @@
+"""
+Memoization of the objective function.
+
+Local searches evaluate the same genes more than once, e.g., the parent of
+Powell's method at every iteration and the result of DE before it replaces
+the parent. Objective values are stored in a bounded dictionary keyed by
+the bytes of genes, so that repeated genes are not simulated again.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+__all__ = ["CacheInfo", "ObjectiveCache"]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ObjectiveCache(object):
+    """
+    Objective function that remembers the values of recent genes.
+
+    Parameters
+    ----------
+    obj_func : callable f(indiv_gene, bound=None)
+        The objective function of a model.
+
+    maxsize : int (default: 1024)
+        The number of genes kept. The least recently used ones are discarded.
+    """
+
+    def __init__(self, obj_func: Callable[..., float], maxsize: int = 1024) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer.")
+        self.obj_func = obj_func
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self) -> dict:
+        # Sent to worker processes (DE with workers != 1) without the values.
+        return {"obj_func": self.obj_func, "maxsize": self.maxsize}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def __call__(self, indiv_gene: np.ndarray, bound: Optional[float] = None) -> float:
+        key = np.ascontiguousarray(indiv_gene, dtype=np.float64).tobytes()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        if bound is None:
+            objval = self.obj_func(indiv_gene)
+        else:
+            objval = self.obj_func(indiv_gene, bound=bound)
+            if not objval <= bound:
+                # Possibly a lower bound of the objective value
+                return objval
+        with self._lock:
+            self._cache[key] = objval
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return objval
+
+    def cache_info(self) -> CacheInfo:
+        """The numbers of hits and misses, and the size of the cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def cache_clear(self) -> None:
+        """Discard the stored values and reset the counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,120 @@
+"""
+Progress log of a parameter search.
+
+Lines of out/n/optimization.log are buffered in memory and written by a
+background thread every `flush_interval` seconds, or as soon as
+`buffer_size` lines are waiting, instead of opening the file for each line.
+The best fitness of every generation is also written to
+out/n/optimization.jsonl, one JSON object per line, e.g.,
+
+    {"generation": 2, "best_fitness": 1.726069, "time": 1634567890.123}
+"""
+import json
+import threading
+import time
+from typing import List, Optional
+
+__all__ = ["ProgressLog"]
+
+
+class ProgressLog(object):
+    """
+    Buffered writer of optimization.log and optimization.jsonl.
+
+    Parameters
+    ----------
+    path : str
+        Path to optimization.log. The structured log is written next to it,
+        with the suffix .jsonl.
+
+    mode : str (default: 'a')
+        'w' to start new logs, 'a' to append to existing ones.
+
+    flush_interval : float (default: 1.0)
+        Seconds between writes to the files.
+
+    buffer_size : int (default: 1000)
+        The number of buffered lines that triggers a write.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "a",
+        flush_interval: float = 1.0,
+        buffer_size: int = 1000,
+    ) -> None:
+        if mode not in ["w", "a"]:
+            raise ValueError("mode must be either 'w' or 'a'.")
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._text = open(path, mode)
+        self._jsonl = open(path.rsplit(".", 1)[0] + ".jsonl", mode)
+        self._lines: List[str] = []
+        self._records: List[str] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "ProgressLog":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, text: str) -> None:
+        """Add text to optimization.log."""
+        with self._lock:
+            self._lines.append(text)
+            n_waiting = len(self._lines)
+        if n_waiting >= self.buffer_size:
+            self._wakeup.set()
+
+    def generation(self, generation: int, best_fitness: float) -> None:
+        """Log the best fitness of a generation in both files."""
+        record = json.dumps(
+            {"generation": generation, "best_fitness": float(best_fitness), "time": time.time()}
+        )
+        with self._lock:
+            self._records.append(record + "\n")
+        self.write(f"Generation{generation:d}: Best Fitness = {best_fitness:e}\n")
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except BaseException as e:
+                self._error = e
+                return
+
+    def _flush(self) -> None:
+        with self._lock:
+            (lines, self._lines) = (self._lines, [])
+            (records, self._records) = (self._records, [])
+        if lines:
+            self._text.write("".join(lines))
+            self._text.flush()
+        if records:
+            self._jsonl.write("".join(records))
+            self._jsonl.flush()
+
+    def close(self) -> None:
+        """Write the remaining lines and close the files."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        try:
+            if self._error is None:
+                self._flush()
+        finally:
+            self._text.close()
+            self._jsonl.close()
+        if self._error is not None:
+            raise self._error
@@ -13,7 +13,8 @@ References
 """
 
 from dataclasses import dataclass, field
-from typing import Callable
+from functools import partial
+from typing import Callable, Optional
 
 import numpy as np
 from scipy.optimize import differential_evolution, minimize
@@ -27,39 +28,60 @@ class RealCodedGeneticAlgorithm(object):
     n_children: int
     maxiter: int
     workers: int
+    evaluator: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    early_rejection: bool = False
     n_children_for_endx: int = field(default=10, init=False)
 
-    def _xover(self, parents: np.ndarray) -> np.ndarray:
-        """Extended Normal Distribution Xover"""
+    def evaluate(self, genes: np.ndarray, bound: Optional[float] = None) -> np.ndarray:
+        """Objective values of individuals, computed by the evaluator if given.
+
+        With early_rejection, individuals whose objective value exceeds
+        `bound` may get a lower bound of it instead.
+        """
+        if not self.early_rejection:
+            bound = None
+        if self.evaluator is None or len(genes) < 2:
+            obj_func = self.obj_func if bound is None else partial(self.obj_func, bound=bound)
+            return np.array([obj_func(gene) for gene in genes], dtype=float)
+        return self.evaluator(genes) if bound is None else self.evaluator(genes, bound=bound)
+
+    def _sample(self, candidates: np.ndarray, n_samples: int, size: int) -> np.ndarray:
+        """Draw n_samples sets of `size` individuals from candidates without replacement."""
+        keys = np.random.rand(n_samples, len(candidates))
+        return candidates[np.argpartition(keys, size - 1, axis=1)[:, :size]]
+
+    def _xover(self, parents: np.ndarray, population: np.ndarray, ip: np.ndarray) -> np.ndarray:
+        """Extended Normal Distribution Xover
+
+        Generates a child of the two parents from each row of ip, the indices
+        of n_gene individuals in the population.
+        """
         ALPHA = (1.0 - 2 * 0.35 ** 2) ** 0.5 / 2.0
         BETA = 0.35 / (self.n_gene - 1) ** 0.5
 
-        child = np.empty(self.n_gene + 1)
+        children = np.empty((len(ip), self.n_gene + 1))
 
         t1 = (parents[1, : self.n_gene] - parents[0, : self.n_gene]) / 2.0
-        t2 = np.random.normal(scale=ALPHA) * (
+        t2 = np.random.normal(scale=ALPHA, size=(len(ip), 1)) * (
             parents[1, : self.n_gene] - parents[0, : self.n_gene]
         )
-        t3 = np.sum(
-            np.random.normal(scale=BETA, size=self.n_gene)[:, np.newaxis]
-            * (
-                parents[2:, : self.n_gene]
-                - (np.sum(parents[2:, : self.n_gene], axis=0) / self.n_gene)
-            ),
-            axis=0,
+        # sum_j s_j * (p_j - sum_k p_k / n_gene) = sum_j (s_j - sum_k s_k / n_gene) * p_j
+        s = np.random.normal(scale=BETA, size=ip.shape)
+        weights = np.zeros((len(ip), self.n_population))
+        weights[np.arange(len(ip))[:, np.newaxis], ip] = s - (
+            np.sum(s, axis=1, keepdims=True) / self.n_gene
         )
-        child[: self.n_gene] = t1 + t2 + t3
-        child[: self.n_gene] = np.clip(child[: self.n_gene], 0.0, 1.0)
-        child[-1] = 1e12  # assigns the worst objective value to the children.
+        t3 = weights @ population[:, : self.n_gene]
+        children[:, : self.n_gene] = t1 + t2 + t3
+        children[:, : self.n_gene] = np.clip(children[:, : self.n_gene], 0.0, 1.0)
+        children[:, -1] = 1e12  # assigns the worst objective value to the children.
 
-        return child
+        return children
 
     def converging(self, ip: np.ndarray, population: np.ndarray) -> np.ndarray:
-        children = np.empty((self.n_children_for_endx, self.n_gene + 1))
-
-        for i in range(self.n_children_for_endx):
-            ip[2:] = np.random.choice(self.n_population, self.n_gene, replace=False)
-            children[i, :] = self._xover(population[ip, :])
+        samples = self._sample(np.arange(self.n_population), self.n_children_for_endx, self.n_gene)
+        ip[2:] = samples[-1]
+        children = self._xover(population[ip[:2], :], population, samples)
 
         family = np.empty((self.n_children_for_endx + 2, self.n_gene + 1))
         family[: self.n_children_for_endx, :] = children
@@ -82,25 +104,29 @@ class RealCodedGeneticAlgorithm(object):
 
         return population
 
-    def _mutation(self, parents: np.ndarray) -> np.ndarray:
-        """Normal Distribution Mutation"""
+    def _mutation(self, parent: np.ndarray, population: np.ndarray, ip: np.ndarray) -> np.ndarray:
+        """Normal Distribution Mutation
+
+        Generates a child of `parent` from each row of ip, the indices of
+        n_gene + 1 individuals in the population.
+        """
         GAMMA = 0.35 / self.n_gene ** 0.5
 
-        child = np.empty(self.n_gene + 1)
+        children = np.empty((len(ip), self.n_gene + 1))
 
-        t2 = np.sum(
-            np.random.normal(scale=GAMMA, size=self.n_gene + 1)[:, np.newaxis]
-            * (
-                parents[1:, : self.n_gene]
-                - (np.sum(parents[1:, : self.n_gene], axis=0) / (self.n_gene + 1))
-            ),
-            axis=0,
+        # sum_j r_j * (p_j - centroid) = sum_j (r_j - sum_k r_k / (n_gene + 1)) * p_j
+        r = np.random.normal(scale=GAMMA, size=ip.shape)
+        weights = np.zeros((len(ip), self.n_population))
+        weights[np.arange(len(ip))[:, np.newaxis], ip] = r - (
+            np.sum(r, axis=1, keepdims=True) / (self.n_gene + 1)
         )
-        child[: self.n_gene] = parents[0, : self.n_gene] + t2
-        child[: self.n_gene] = np.clip(child[: self.n_gene], 0.0, 1.0)
-        child[-1] = self.obj_func(child[: self.n_gene])
+        t2 = weights @ population[:, : self.n_gene]
+        children[:, : self.n_gene] = parent[: self.n_gene] + t2
+        children[:, : self.n_gene] = np.clip(children[:, : self.n_gene], 0.0, 1.0)
+        # Children worse than the parent are not selected.
+        children[:, -1] = self.evaluate(children[:, : self.n_gene], bound=parent[-1])
 
-        return child
+        return children
 
     def local_search(
         self,
@@ -113,14 +139,12 @@ class RealCodedGeneticAlgorithm(object):
         consisting of the two parents, i.e., p1 and p2, and their children.
         """
         if method == "mutation":
-            idx = [True] * self.n_population
-            idx[ip[0]] = False
-            children = np.empty((self.n_children, self.n_gene + 1))
-            for i in range(self.n_children):
-                ip[1:] = np.random.choice(
-                    np.arange(self.n_population)[idx], self.n_gene + 1, replace=False
-                )
-                children[i, :] = self._mutation(population[ip, :])
+            candidates = np.delete(np.arange(self.n_population), ip[0])
+            children = self._mutation(
+                population[ip[0], :],
+                population,
+                self._sample(candidates, self.n_children, self.n_gene + 1),
+            )
             family = np.empty((self.n_children + 1, self.n_gene + 1))
             family[: self.n_children, :] = children
             family[-1, :] = population[ip[0], :]
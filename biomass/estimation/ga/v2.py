@@ -1,12 +1,18 @@
+import multiprocessing
 import os
 import time
 import warnings
-from typing import NoReturn, Optional
+from multiprocessing.connection import Connection
+from typing import Callable, NoReturn, Optional, Tuple, Union
 
 import numpy as np
 
+from ...checkpoint import CHECKPOINT, CheckpointWriter, load_checkpoint, load_population
 from ...exec_model import ExecModel
 from ...template import BioMassModel
+from .evaluation import get_evaluator
+from .memo import ObjectiveCache
+from .progress import ProgressLog
 from .rcga import RealCodedGeneticAlgorithm
 
 
@@ -21,6 +27,61 @@ def _check_unknown_options(unknown_options: dict) -> Optional[NoReturn]:
     return None
 
 
+def _next_generation(
+    rcga: RealCodedGeneticAlgorithm,
+    population: np.ndarray,
+    generation: int,
+    n_iter: int,
+    n0: np.ndarray,
+    local_search_method: str,
+) -> Tuple[np.ndarray, int]:
+    """Steps 2-7 of ga_v2: returns the next population and the adapted n_iter."""
+    ip = np.random.choice(rcga.n_population, rcga.n_gene + 2, replace=False)
+    population = rcga.converging(ip, population)
+    population = rcga.local_search(ip, population, local_search_method)
+    for _ in range(n_iter - 1):
+        ip = np.random.choice(rcga.n_population, rcga.n_gene + 2, replace=False)
+        population = rcga.converging(ip, population)
+    # Adaptation of n_iter
+    if generation % len(n0) == len(n0) - 1:
+        n0[-1] = population[0, -1]
+        if n0[0] == n0[-1]:
+            n_iter *= 2
+        else:
+            n_iter = 1
+    else:
+        n0[generation % len(n0)] = population[0, -1]
+
+    return population, n_iter
+
+
+def _progress_log(model: BioMassModel, nth_paramset: int, mode: str) -> ProgressLog:
+    return ProgressLog(
+        os.path.join(
+            model.path,
+            "out",
+            f"{nth_paramset:d}",
+            "optimization.log",
+        ),
+        mode,
+    )
+
+
+def _checkpoint(
+    model: BioMassModel, nth_paramset: int, n_gene: int, resume: bool = False
+) -> CheckpointWriter:
+    return CheckpointWriter(
+        os.path.join(
+            model.path,
+            "out",
+            f"{nth_paramset:d}",
+            CHECKPOINT,
+        ),
+        n_gene,
+        resume=resume,
+    )
+
+
 class GeneticAlgorithmInit(ExecModel):
     def __init__(
         self,
@@ -32,7 +93,13 @@ class GeneticAlgorithmInit(ExecModel):
         n_children: int,
         maxiter: int,
         workers: int,
+        threads: int,
+        evaluator: Union[str, Callable[[np.ndarray], np.ndarray]],
+        early_rejection: bool,
         overwrite: bool,
+        islands: int,
+        migration_interval: int,
+        migration_size: int,
         **unknown_options,
     ) -> None:
         super().__init__(model)
@@ -45,11 +112,24 @@ class GeneticAlgorithmInit(ExecModel):
         self.n_children: int = n_children
         self.maxiter: int = maxiter
         self.workers: int = workers
+        self.threads: int = threads
+        self.evaluator: Union[str, Callable[[np.ndarray], np.ndarray]] = evaluator
+        self.early_rejection: bool = early_rejection
         self.overwrite: bool = overwrite
+        self.islands: int = islands
+        self.migration_interval: int = migration_interval
+        self.migration_size: int = migration_size
 
         _check_unknown_options(unknown_options)
         if self.n_population < self.n_gene + 2:
             raise ValueError(f"n_population must be larger than {self.n_gene + 2:d}")
+        if self.n_population // self.islands < self.n_gene + 2:
+            raise ValueError(
+                f"n_population / islands must be larger than {self.n_gene + 2:d}. "
+                "Increase popsize or decrease islands."
+            )
+        if not 0 < self.migration_size <= self.n_population // self.islands:
+            raise ValueError("migration_size must lie within the population of an island.")
 
     def run(self, nth_paramset: int) -> None:
         os.makedirs(
@@ -84,7 +164,7 @@ class GeneticAlgorithmInit(ExecModel):
                     )
                 )
                 for file in files:
-                    if any(map(file.__contains__, (".npy", ".log"))):
+                    if any(map(file.__contains__, (".npy", ".npz", ".log", ".jsonl", ".dat"))):
                         os.remove(
                             os.path.join(
                                 self.model.path,
@@ -103,34 +183,42 @@ class GeneticAlgorithmInit(ExecModel):
                 )
         np.random.seed(time.time_ns() * nth_paramset % 2 ** 32)
         warnings.filterwarnings("ignore")
-        self._ga_v2(nth_paramset)
+        if self.islands > 1:
+            self._island_model(nth_paramset)
+        else:
+            self._ga_v2(nth_paramset)
 
-    def _set_initial(self, nth_paramset: int) -> np.ndarray:
-        population = np.full((self.n_population, self.n_gene + 1), np.inf)
-        with open(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "optimization.log",
-            ),
-            mode="w",
-        ) as f:
-            f.write("Generating the initial population. . .\n")
-        for i in range(self.n_population):
-            while 1e12 <= population[i, -1] or np.isnan(population[i, -1]):
-                population[i, : self.n_gene] = np.random.rand(self.n_gene)
-                population[i, -1] = self.model.obj_func(population[i, : self.n_gene])
-            with open(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "optimization.log",
-                ),
-                mode="a",
-            ) as f:
-                f.write(f"{i + 1:d} / {self.n_population:d}\n")
+    def _rcga(self, n_population: int) -> RealCodedGeneticAlgorithm:
+        return RealCodedGeneticAlgorithm(
+            ObjectiveCache(self.model.obj_func),
+            n_population,
+            self.n_gene,
+            self.n_children,
+            self.maxiter,
+            self.workers,
+            get_evaluator(self.model, self.evaluator, self.threads, self.workers),
+            self.early_rejection,
+        )
+
+    def _set_initial(
+        self, rcga: RealCodedGeneticAlgorithm, log: Optional[ProgressLog] = None
+    ) -> np.ndarray:
+        population = np.full((rcga.n_population, self.n_gene + 1), np.inf)
+        if log is not None:
+            log.write("Generating the initial population. . .\n")
+        n_valid = 0
+        while n_valid < rcga.n_population:
+            # Individuals whose simulation failed are generated again.
+            genes = np.random.rand(rcga.n_population - n_valid, self.n_gene)
+            obj_val = rcga.evaluate(genes)
+            valid = obj_val < 1e12
+            n_new = np.count_nonzero(valid)
+            population[n_valid : n_valid + n_new, : self.n_gene] = genes[valid]
+            population[n_valid : n_valid + n_new, -1] = obj_val[valid]
+            if log is not None:
+                for i in range(n_valid, n_valid + n_new):
+                    log.write(f"{i + 1:d} / {self.n_population:d}\n")
+            n_valid += n_new
         population = population[np.argsort(population[:, -1]), :]
 
         return population
@@ -206,137 +294,125 @@ class GeneticAlgorithmInit(ExecModel):
             Stop if the halting criteria are satisfied.
             Otherwise, Generation <- Generation + 1, and return to the step 2.
         """
-        rcga = RealCodedGeneticAlgorithm(
-            self.model.obj_func,
-            self.n_population,
-            self.n_gene,
-            self.n_children,
-            self.maxiter,
-            self.workers,
-        )
+        rcga = self._rcga(self.n_population)
         n_iter = 1
         n0 = np.empty(3 * self.n_population)
 
-        population = self._set_initial(nth_paramset)
-        n0[0] = population[0, -1]
-
-        with open(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "optimization.log",
-            ),
-            mode="a",
-        ) as f:
-            f.write(
-                "\n----------------------------------------\n\n"
-                + f"Generation1: Best Fitness = {population[0, -1]:e}\n"
-            )
-        best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
-        best_fitness = population[0, -1]
-
-        np.save(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "generation.npy",
-            ),
-            1,
-        )
-        np.save(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "fit_param1.npy",
-            ),
-            best_individual,
-        )
-        np.save(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "best_fitness.npy",
-            ),
-            best_fitness,
-        )
-        if population[0, -1] <= self.allowable_error:
-            return
-
-        generation = 1
-        while generation < self.max_generation:
-            ip = np.random.choice(self.n_population, self.n_gene + 2, replace=False)
-            population = rcga.converging(ip, population)
-            population = rcga.local_search(ip, population, self.local_search_method)
-            for _ in range(n_iter - 1):
-                ip = np.random.choice(self.n_population, self.n_gene + 2, replace=False)
-                population = rcga.converging(ip, population)
-            # Adaptation of n_iter
-            if generation % len(n0) == len(n0) - 1:
-                n0[-1] = population[0, -1]
-                if n0[0] == n0[-1]:
-                    n_iter *= 2
-                else:
-                    n_iter = 1
-            else:
-                n0[generation % len(n0)] = population[0, -1]
+        with _progress_log(self.model, nth_paramset, "w") as log, _checkpoint(
+            self.model, nth_paramset, self.n_gene
+        ) as checkpoint:
+            population = self._set_initial(rcga, log)
+            n0[0] = population[0, -1]
 
+            log.write("\n----------------------------------------\n\n")
+            log.generation(1, population[0, -1])
             best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
-            if population[0, -1] < best_fitness:
-                np.save(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        "generation.npy",
-                    ),
-                    generation + 1,
-                )
-                np.save(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        f"fit_param{generation + 1:d}.npy",
-                    ),
-                    best_individual,
-                )
             best_fitness = population[0, -1]
-            np.save(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "best_fitness.npy",
-                ),
-                best_fitness,
-            )
-            np.save(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "count_num.npy",
-                ),
-                generation + 1,
-            )
-            with open(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "optimization.log",
-                ),
-                mode="a",
-            ) as f:
-                f.write(f"Generation{generation + 1:d}: " f"Best Fitness = {best_fitness:e}\n")
+
+            checkpoint.save_best(1, best_fitness, best_individual)
+            checkpoint.save_state(1, population, n_iter, n0)
             if population[0, -1] <= self.allowable_error:
+                return
+
+            generation = 1
+            while generation < self.max_generation:
+                (population, n_iter) = _next_generation(
+                    rcga, population, generation, n_iter, n0, self.local_search_method
+                )
+
+                if population[0, -1] < best_fitness:
+                    best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
+                    checkpoint.save_best(generation + 1, population[0, -1], best_individual)
+                best_fitness = population[0, -1]
+                checkpoint.save_state(generation + 1, population, n_iter, n0)
+                checkpoint.save_count(generation + 1)
+                log.generation(generation + 1, best_fitness)
+                if population[0, -1] <= self.allowable_error:
+                    break
+
+                generation += 1
+
+        return
+
+    def _island(self, conn: Connection, nth_paramset: int, seed: int) -> None:
+        """Evolve a subpopulation, exchanging elites with other islands through conn.
+
+        Every migration_interval generations, the best migration_size
+        individuals are sent to the main process, which returns those of
+        the previous island (ring topology) to replace the worst ones here.
+        """
+        np.random.seed(seed)
+        warnings.filterwarnings("ignore")
+        n_population = self.n_population // self.islands
+        rcga = self._rcga(n_population)
+        n_iter = 1
+        n0 = np.empty(3 * n_population)
+
+        population = self._set_initial(rcga)
+        n0[0] = population[0, -1]
+
+        generation = 1
+        while True:
+            conn.send(population[: self.migration_size, :])
+            (migrants, stop) = conn.recv()
+            if stop:
                 break
+            population[-self.migration_size :, :] = migrants
+            population = population[np.argsort(population[:, -1]), :]
+            for _ in range(min(self.migration_interval, self.max_generation - generation)):
+                (population, n_iter) = _next_generation(
+                    rcga, population, generation, n_iter, n0, self.local_search_method
+                )
+                generation += 1
+        conn.close()
 
-            generation += 1
+    def _island_model(self, nth_paramset: int) -> None:
+        """Run ga_v2 with the population split into islands evolving in parallel processes.
+
+        The main process collects the elites of all islands, saves the best
+        individual in out/n/ as _ga_v2 does and distributes the migrants.
+        """
+        log = _progress_log(self.model, nth_paramset, "w")
+        log.write(f"Generating the initial population of {self.islands:d} islands. . .\n")
+        checkpoint = _checkpoint(self.model, nth_paramset, self.n_gene)
+        seeds = np.random.randint(2 ** 32, size=self.islands, dtype=np.int64)
+        pipes = [multiprocessing.Pipe() for _ in range(self.islands)]
+        processes = [
+            multiprocessing.Process(target=self._island, args=(conn, nth_paramset, seed))
+            for (_, conn), seed in zip(pipes, seeds)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            generation = 1
+            best_fitness = np.inf
+            while True:
+                elites = [conn.recv() for conn, _ in pipes]
+                best = min((elite[0, :] for elite in elites), key=lambda indiv: indiv[-1])
+                if best[-1] < best_fitness:
+                    checkpoint.save_best(
+                        generation, best[-1], self.model.sp.gene2val(best[: self.n_gene])
+                    )
+                best_fitness = min(best_fitness, best[-1])
+                checkpoint.save_count(generation)
+                if generation == 1:
+                    log.write("\n----------------------------------------\n\n")
+                log.generation(generation, best_fitness)
+                stop = best_fitness <= self.allowable_error or self.max_generation <= generation
+                for i, (conn, _) in enumerate(pipes):
+                    conn.send((elites[i - 1], stop))
+                if stop:
+                    break
+                generation = min(generation + self.migration_interval, self.max_generation)
+        except BaseException:
+            for process in processes:
+                process.terminate()
+            raise
+        finally:
+            checkpoint.close()
+            log.close()
+            for process in processes:
+                process.join()
 
         return
 
@@ -352,6 +428,9 @@ class GeneticAlgorithmContinue(ExecModel):
         n_children: int,
         maxiter: int,
         workers: int,
+        threads: int,
+        evaluator: Union[str, Callable[[np.ndarray], np.ndarray]],
+        early_rejection: bool,
         p0_bounds: list,
         **unknown_options,
     ) -> None:
@@ -365,6 +444,9 @@ class GeneticAlgorithmContinue(ExecModel):
         self.n_children: int = n_children
         self.maxiter: int = maxiter
         self.workers: int = workers
+        self.threads: int = threads
+        self.evaluator: Union[str, Callable[[np.ndarray], np.ndarray]] = evaluator
+        self.early_rejection: bool = early_rejection
         self.p0_bounds: list = p0_bounds
 
         _check_unknown_options(unknown_options)
@@ -377,221 +459,135 @@ class GeneticAlgorithmContinue(ExecModel):
         warnings.filterwarnings("ignore")
         self._my_ga_continue(nth_paramset)
 
-    def _set_continue(self, nth_paramset: int) -> np.ndarray:
-        best_generation = np.load(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "generation.npy",
-            )
-        )
-        best_individual = np.load(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                f"fit_param{int(best_generation):d}.npy",
-            )
-        )
+    def _set_continue(
+        self, nth_paramset: int, rcga: RealCodedGeneticAlgorithm, log: ProgressLog
+    ) -> np.ndarray:
+        best_individual = self.get_individual(nth_paramset)
         population = np.full((self.n_population, self.n_gene + 1), np.inf)
 
-        with open(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "optimization.log",
-            ),
-            mode="a",
-        ) as f:
-            f.write(
-                "\n########################################"
-                "\n############### Continue ###############"
-                "\n########################################"
-                "\nGenerating the initial population. . .\n"
+        log.write(
+            "\n########################################"
+            "\n############### Continue ###############"
+            "\n########################################"
+            "\nGenerating the initial population. . .\n"
+        )
+        n_valid = 0
+        while n_valid < self.n_population:
+            genes = self._encode_bestIndivVal2randGene(
+                best_individual, self.n_population - n_valid
             )
-        for i in range(self.n_population):
-            while 1e12 <= population[i, -1]:
-                population[i, : self.n_gene] = self._encode_bestIndivVal2randGene(best_individual)
-                population[i, : self.n_gene] = np.clip(population[i, : self.n_gene], 0.0, 1.0)
-                population[i, -1] = self.model.obj_func(population[i, : self.n_gene])
-            with open(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "optimization.log",
-                ),
-                mode="a",
-            ) as f:
-                f.write(f"{i + 1:d} / {self.n_population:d}\n")
+            genes = np.clip(genes, 0.0, 1.0)
+            obj_val = rcga.evaluate(genes)
+            valid = ~(1e12 <= obj_val)
+            n_new = np.count_nonzero(valid)
+            population[n_valid : n_valid + n_new, : self.n_gene] = genes[valid]
+            population[n_valid : n_valid + n_new, -1] = obj_val[valid]
+            for i in range(n_valid, n_valid + n_new):
+                log.write(f"{i + 1:d} / {self.n_population:d}\n")
+            n_valid += n_new
         population = population[np.argsort(population[:, -1]), :]
 
         return population
 
-    def _encode_bestIndivVal2randGene(self, best_individual: np.ndarray) -> np.ndarray:
-        rand_gene = (
-            np.log10(
-                best_individual
-                * 10
-                ** (
-                    np.random.rand(len(best_individual))
-                    * np.log10(self.p0_bounds[1] / self.p0_bounds[0])
-                    + np.log10(self.p0_bounds[0])
-                )
-            )
-            - self.search_rgn[0, :]
-        ) / (self.search_rgn[1, :] - self.search_rgn[0, :])
+    def _encode_bestIndivVal2randGene(
+        self, best_individual: np.ndarray, n_individuals: int
+    ) -> np.ndarray:
+        """Genes of n_individuals random individuals within p0_bounds of best_individual"""
+        rand_individuals = best_individual * 10 ** (
+            np.random.rand(n_individuals, len(best_individual))
+            * np.log10(self.p0_bounds[1] / self.p0_bounds[0])
+            + np.log10(self.p0_bounds[0])
+        )
 
-        return rand_gene
+        return self.model.sp.val2gene(rand_individuals)
 
     def _my_ga_continue(self, nth_paramset: int) -> None:
         rcga = RealCodedGeneticAlgorithm(
-            self.model.obj_func,
+            ObjectiveCache(self.model.obj_func),
             self.n_population,
             self.n_gene,
             self.n_children,
             self.maxiter,
             self.workers,
+            get_evaluator(self.model, self.evaluator, self.threads, self.workers),
+            self.early_rejection,
         )
         n_iter = 1
         n0 = np.empty(3 * self.n_population)
 
-        count_num = np.load(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "count_num.npy",
-            )
-        )
-        best_generation = np.load(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "generation.npy",
-            )
-        )
-        best_individual = np.load(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                f"fit_param{int(best_generation):d}.npy",
-            )
-        )
-        best_individual_gene = self.model.sp.val2gene(best_individual)
-        best_fitness = self.model.obj_func(best_individual_gene)
+        count_num = self.get_count_num(nth_paramset)
+        best_individual = self.get_individual(nth_paramset)
 
         if self.max_generation <= count_num:
             raise ValueError(f"max_generation should be larger than {int(count_num):d}")
 
-        population = self._set_continue(nth_paramset)
-        if best_fitness < population[0, -1]:
-            population[0, : self.n_gene] = best_individual_gene
-            population[0, -1] = best_fitness
-        else:
-            best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
-            best_fitness = population[0, -1]
-            np.save(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    f"fit_param{int(count_num) + 1:d}.npy",
-                ),
-                best_individual,
-            )
-        with open(
-            os.path.join(
-                self.model.path,
-                "out",
-                f"{nth_paramset:d}",
-                "optimization.log",
-            ),
-            mode="a",
-        ) as f:
-            f.write(
-                "\n----------------------------------------\n\n"
-                f"Generation{int(count_num) + 1:d}: "
-                f"Best Fitness = {best_fitness:e}\n"
-            )
-        n0[0] = population[0, -1]
-
-        if population[0, -1] <= self.allowable_error:
-            return
-
-        generation = 1 + int(count_num)
-        while generation < self.max_generation:
-            ip = np.random.choice(self.n_population, self.n_gene + 2, replace=False)
-            population = rcga.converging(ip, population)
-            population = rcga.local_search(ip, population, self.local_search_method)
-            for _ in range(n_iter - 1):
-                ip = np.random.choice(self.n_population, self.n_gene + 2, replace=False)
-                population = rcga.converging(ip, population)
-            if generation % len(n0) == len(n0) - 1:
-                n0[-1] = population[0, -1]
-                if n0[0] == n0[-1]:
-                    n_iter *= 2
-                else:
-                    n_iter = 1
-            else:
-                n0[generation % len(n0)] = population[0, -1]
-
-            best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
-            if population[0, -1] < best_fitness:
-                np.save(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        "generation.npy",
-                    ),
-                    generation + 1,
-                )
-                np.save(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        f"fit_param{generation + 1:d}.npy",
-                    ),
+        out = os.path.join(self.model.path, "out", f"{nth_paramset:d}")
+        legacy = load_checkpoint(out) is None
+        state = load_population(out)
+        with _progress_log(self.model, nth_paramset, "a") as log, _checkpoint(
+            self.model, nth_paramset, self.n_gene, resume=True
+        ) as checkpoint:
+            if legacy:
+                # Move results saved as .npy files by older versions to the checkpoint.
+                checkpoint.save_best(
+                    int(np.load(os.path.join(out, "generation.npy"))),
+                    self.get_best_fitness(nth_paramset),
                     best_individual,
                 )
-                np.save(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        "best_fitness",
-                    ),
-                    best_fitness,
+                checkpoint.save_count(count_num)
+
+            if (
+                state is not None
+                and state.generation == count_num
+                and state.population.shape == (self.n_population, self.n_gene + 1)
+            ):
+                # Resume exactly from the population of the last generation.
+                np.random.set_state(state.random_state)
+                (population, n_iter, n0) = (state.population, state.n_iter, state.n0)
+                best_fitness = population[0, -1]
+                log.write(
+                    "\n########################################"
+                    "\n############### Continue ###############"
+                    "\n########################################"
+                    f"\nResuming the population of Generation{int(count_num):d}.\n\n"
                 )
-            best_fitness = population[0, -1]
-            np.save(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "count_num.npy",
-                ),
-                generation + 1,
-            )
-            with open(
-                os.path.join(
-                    self.model.path,
-                    "out",
-                    f"{nth_paramset:d}",
-                    "optimization.log",
-                ),
-                mode="a",
-            ) as f:
-                f.write(f"Generation{generation + 1:d}: " f"Best Fitness = {best_fitness:e}\n")
+                generation = int(count_num)
+            else:
+                best_individual_gene = self.model.sp.val2gene(best_individual)
+                best_fitness = self.model.obj_func(best_individual_gene)
+                population = self._set_continue(nth_paramset, rcga, log)
+                if best_fitness < population[0, -1]:
+                    population[0, : self.n_gene] = best_individual_gene
+                    population[0, -1] = best_fitness
+                else:
+                    best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
+                    best_fitness = population[0, -1]
+                    checkpoint.save_best(int(count_num) + 1, best_fitness, best_individual)
+                log.write("\n----------------------------------------\n\n")
+                log.generation(int(count_num) + 1, best_fitness)
+                n0[0] = population[0, -1]
+                generation = 1 + int(count_num)
+                checkpoint.save_state(generation, population, n_iter, n0)
+                checkpoint.save_count(generation)
+
             if population[0, -1] <= self.allowable_error:
-                break
+                return
+
+            while generation < self.max_generation:
+                (population, n_iter) = _next_generation(
+                    rcga, population, generation, n_iter, n0, self.local_search_method
+                )
 
-            generation += 1
+                if population[0, -1] < best_fitness:
+                    best_individual = self.model.sp.gene2val(population[0, : self.n_gene])
+                    checkpoint.save_best(generation + 1, population[0, -1], best_individual)
+                best_fitness = population[0, -1]
+                checkpoint.save_state(generation + 1, population, n_iter, n0)
+                checkpoint.save_count(generation + 1)
+                log.generation(generation + 1, best_fitness)
+                if population[0, -1] <= self.allowable_error:
+                    break
+
+                generation += 1
 
         return
@@ -0,0 +1,140 @@
+"""
+Persistent pool of processes for running many jobs on one model.
+
+The model is sent to each worker once, when the pool starts, instead of
+with every task. Workers are not daemonic, so a job may start processes of
+its own, e.g., DE with options['workers'] != 1, evaluator='processes' or
+islands > 1.
+
+Examples
+--------
+>>> with WorkerPool(model, workers=4) as pool:
+...     optimize(model, start=1, end=100, pool=pool)
+...     optimize_continue(model, start=1, end=100, pool=pool)
+"""
+import functools
+import multiprocessing
+import multiprocessing.pool
+import os
+from typing import Any, Callable, Iterable, List, Optional
+
+__all__ = ["WorkerPool"]
+
+_model = None
+
+
+class _WorkerProcess(multiprocessing.Process):
+    # multiprocessing.Pool sets daemon = True, which forbids child processes.
+    @property
+    def daemon(self) -> bool:
+        return False
+
+    @daemon.setter
+    def daemon(self, value: bool) -> None:
+        pass
+
+
+class _WorkerContext(type(multiprocessing.get_context())):
+    Process = _WorkerProcess
+
+
+def _load(model) -> None:
+    global _model
+    _model = model
+
+
+def _call(func: Callable[[Any, Any], Any], item: Any) -> Any:
+    return func(_model, item)
+
+
+class WorkerPool(object):
+    """
+    Worker processes, each holding its own copy of a model.
+
+    Parameters
+    ----------
+    model : BioMassModel
+        Model passed to every job.
+
+    workers : int, optional
+        The number of processes (default: the number of CPU cores - 1).
+        Supply -1 to use all available CPU cores.
+
+    chunksize : int (default: 1)
+        The number of items sent to a worker at once by map.
+    """
+
+    def __init__(
+        self,
+        model,
+        workers: Optional[int] = None,
+        chunksize: int = 1,
+    ) -> None:
+        if workers is None:
+            workers = max(1, os.cpu_count() - 1)
+        elif workers == -1:
+            workers = os.cpu_count()
+        if workers < 1:
+            raise ValueError("workers must be a positive integer or -1.")
+        if chunksize < 1:
+            raise ValueError("chunksize must be a positive integer.")
+        self.model = model
+        self.workers = workers
+        self.chunksize = chunksize
+        self._pool = multiprocessing.pool.Pool(
+            processes=workers,
+            initializer=_load,
+            initargs=(model,),
+            context=_WorkerContext(),
+        )
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def map(
+        self,
+        func: Callable[[Any, Any], Any],
+        iterable: Iterable,
+        chunksize: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Apply a job to each item in parallel.
+
+        Parameters
+        ----------
+        func : callable f(model, item)
+            A picklable job, e.g., a module-level function or a
+            functools.partial of one. `model` is the copy held by the worker.
+
+        iterable : iterable
+            Items passed to `func`.
+
+        chunksize : int, optional
+            Overrides the chunksize of the pool for this call.
+
+        Returns
+        -------
+        results : list
+            Return values of `func`, in the order of `iterable`.
+        """
+        return self._pool.map(
+            functools.partial(_call, func),
+            iterable,
+            chunksize=self.chunksize if chunksize is None else chunksize,
+        )
+
+    def close(self) -> None:
+        """Wait for the submitted jobs and stop the workers."""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self) -> None:
+        """Stop the workers immediately."""
+        self._pool.terminate()
+        self._pool.join()
@@ -5,6 +5,7 @@ from typing import List, NamedTuple
 
 import numpy as np
 
+from .checkpoint import load_checkpoint
 from .template import BioMassModel
 
 
@@ -17,7 +18,14 @@ class OptimizedValues(NamedTuple):
 class ExecModel(object):
     model: BioMassModel
 
+    def _out(self, paramset: int) -> str:
+        return os.path.join(self.model.path, "out", f"{paramset:d}")
+
     def get_individual(self, paramset: int) -> np.ndarray:
+        checkpoint = load_checkpoint(self._out(paramset))
+        if checkpoint is not None:
+            return checkpoint.best_individual
+        # Results saved as .npy files by older versions
         best_generation = np.load(
             os.path.join(
                 self.model.path,
@@ -36,6 +44,46 @@ class ExecModel(object):
         )
         return best_individual
 
+    def get_best_fitness(self, paramset: int) -> float:
+        checkpoint = load_checkpoint(self._out(paramset))
+        if checkpoint is not None:
+            return checkpoint.best_fitness
+        return float(
+            np.load(
+                os.path.join(
+                    self.model.path,
+                    "out",
+                    f"{paramset:d}",
+                    "best_fitness.npy",
+                )
+            )
+        )
+
+    def get_count_num(self, paramset: int) -> int:
+        checkpoint = load_checkpoint(self._out(paramset))
+        if checkpoint is not None:
+            return checkpoint.count_num
+        return int(
+            np.load(
+                os.path.join(
+                    self.model.path,
+                    "out",
+                    f"{paramset:d}",
+                    "count_num.npy",
+                )
+            )
+        )
+
+    def has_result(self, paramset: int) -> bool:
+        return load_checkpoint(self._out(paramset)) is not None or os.path.isfile(
+            os.path.join(
+                self.model.path,
+                "out",
+                f"{paramset:d}",
+                "generation.npy",
+            )
+        )
+
     def load_param(self, paramset: int) -> OptimizedValues:
         best_individual = self.get_individual(paramset)
         (x, y0) = self.model.sp.update(best_individual)
@@ -55,14 +103,7 @@ class ExecModel(object):
                     n_file.append(int(file))
             empty_folder = []
             for i, nth_paramset in enumerate(n_file):
-                if not os.path.isfile(
-                    os.path.join(
-                        self.model.path,
-                        "out",
-                        f"{nth_paramset:d}",
-                        "generation.npy",
-                    )
-                ):
+                if not self.has_result(nth_paramset):
                     empty_folder.append(i)
             for i in sorted(empty_folder, reverse=True):
                 n_file.pop(i)
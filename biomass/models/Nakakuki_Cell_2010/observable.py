@@ -1,7 +1,14 @@
 import numpy as np
-from scipy.integrate import solve_ivp
 from typing import List, Callable, Optional
 
+from biomass.solver import (
+    Branch,
+    find_steady_state,
+    simulate_batch,
+    solve_condition_tree,
+    solve_ode,
+)
+
 from .name2idx import C, V
 from .set_model import DifferentialEquation
 
@@ -18,6 +25,18 @@ observables = [
 ]
 
 
+def _no_ligand(x, y0):
+    x[C.Ligand] = x[C.no_ligand]
+
+
+def _add_egf(x, y0):
+    x[C.Ligand] = x[C.EGF]
+
+
+def _add_hrg(x, y0):
+    x[C.Ligand] = x[C.HRG]
+
+
 class NumericalSimulation(DifferentialEquation):
     """Simulate a model using scipy.integrate.solve_ivp
 
@@ -34,10 +53,16 @@ class NumericalSimulation(DifferentialEquation):
             The experimental conditions to use for normalization.
             If empty, all conditions defined in sim.conditions will be used.
 
+    simulations : numpy array
+        Simulated values of observables, shape (len(observables), len(t), len(conditions)),
+        written by simulate(). Each instance owns its buffer; use
+        biomass.solver.SimulationContext to simulate from several threads.
+
     """
 
     def __init__(self):
         super().__init__(perturbation={})
+        self.simulations = np.empty((len(observables), len(self.t), len(self.conditions)))
         self.normalization = {}
         for observable in observables:
             self.normalization[observable] = {"timepoint": None, "condition": []}
@@ -47,48 +72,100 @@ class NumericalSimulation(DifferentialEquation):
     # Experimental conditions
     conditions = ["EGF", "HRG"]
 
-    simulations = np.empty((len(observables), len(t), len(conditions)))
+    # Ligands are added to the untreated steady state
+    condition_tree = Branch(
+        "untreated",
+        update=_no_ligand,
+        steady_state=True,
+        children=(Branch("EGF", update=_add_egf), Branch("HRG", update=_add_hrg)),
+    )
 
     def simulate(self, x, y0, _perturbation={}):
         if _perturbation:
             self.perturbation = _perturbation
-        # get steady state
-        x[C.Ligand] = x[C.no_ligand]  # No ligand
-        y0 = self._get_steady_state(self.diffeq, y0, tuple(x))
-        if not y0:
+        solutions = self.solve_conditions(x, y0)
+        if solutions is None:
             return False
-        # add ligand
         for i, condition in enumerate(self.conditions):
-            if condition == "EGF":
-                x[C.Ligand] = x[C.EGF]
-            elif condition == "HRG":
-                x[C.Ligand] = x[C.HRG]
-
-            sol = self._solveode(self.diffeq, y0, self.t, tuple(x))
-
-            if sol is None:
-                return False
-            else:
-                self.simulations[observables.index("Phosphorylated_MEKc"), :, i] = sol.y[V.ppMEKc, :]
-                self.simulations[observables.index("Phosphorylated_ERKc"), :, i] = (
-                    sol.y[V.pERKc, :] + sol.y[V.ppERKc, :]
-                )
-                self.simulations[observables.index("Phosphorylated_RSKw"), :, i] = sol.y[V.pRSKc, :] + sol.y[
-                    V.pRSKn, :
-                ] * (x[C.Vn] / x[C.Vc])
-                self.simulations[observables.index("Phosphorylated_CREBw"), :, i] = sol.y[V.pCREBn, :] * (
-                    x[C.Vn] / x[C.Vc]
-                )
-                self.simulations[observables.index("dusp_mRNA"), :, i] = sol.y[V.duspmRNAc, :]
-                self.simulations[observables.index("cfos_mRNA"), :, i] = sol.y[V.cfosmRNAc, :]
-                self.simulations[observables.index("cFos_Protein"), :, i] = (
-                    (sol.y[V.pcFOSn, :] + sol.y[V.cFOSn, :]) * (x[C.Vn] / x[C.Vc])
-                    + sol.y[V.cFOSc, :]
-                    + sol.y[V.pcFOSc, :]
-                )
-                self.simulations[observables.index("Phosphorylated_cFos"), :, i] = (
-                    sol.y[V.pcFOSn, :] * (x[C.Vn] / x[C.Vc]) + sol.y[V.pcFOSc, :]
-                )
+            sol = solutions[condition]
+            x = sol.x
+            self.simulations[observables.index("Phosphorylated_MEKc"), :, i] = sol.y[V.ppMEKc, :]
+            self.simulations[observables.index("Phosphorylated_ERKc"), :, i] = (
+                sol.y[V.pERKc, :] + sol.y[V.ppERKc, :]
+            )
+            self.simulations[observables.index("Phosphorylated_RSKw"), :, i] = sol.y[V.pRSKc, :] + sol.y[
+                V.pRSKn, :
+            ] * (x[C.Vn] / x[C.Vc])
+            self.simulations[observables.index("Phosphorylated_CREBw"), :, i] = sol.y[V.pCREBn, :] * (
+                x[C.Vn] / x[C.Vc]
+            )
+            self.simulations[observables.index("dusp_mRNA"), :, i] = sol.y[V.duspmRNAc, :]
+            self.simulations[observables.index("cfos_mRNA"), :, i] = sol.y[V.cfosmRNAc, :]
+            self.simulations[observables.index("cFos_Protein"), :, i] = (
+                (sol.y[V.pcFOSn, :] + sol.y[V.cFOSn, :]) * (x[C.Vn] / x[C.Vc])
+                + sol.y[V.cFOSc, :]
+                + sol.y[V.pcFOSc, :]
+            )
+            self.simulations[observables.index("Phosphorylated_cFos"), :, i] = (
+                sol.y[V.pcFOSn, :] * (x[C.Vn] / x[C.Vc]) + sol.y[V.pcFOSc, :]
+            )
+
+    def set_timepoints(self, timepoints: List[float]) -> None:
+        """
+        Simulate only at the given time points, e.g., those compared with
+        experimental data in the objective function. The dense time course
+        of the class (NumericalSimulation.t) is not affected.
+
+        Parameters
+        ----------
+        timepoints : list
+            Time points to simulate, including the initial time.
+
+        """
+        self.t = sorted(set(timepoints))
+        self.simulations = np.empty((len(observables), len(self.t), len(self.conditions)))
+
+    def solve_conditions(self, x: list, y0: list) -> Optional[dict]:
+        """
+        Simulate the conditions described by condition_tree, integrating
+        shared segments of their trajectories only once.
+
+        Parameters
+        ----------
+        x : list
+            Model parameters.
+
+        y0 : list
+            Initial values.
+
+        Returns
+        -------
+        solutions : dict
+            For each condition, the solution with fields t, y and x (model
+            parameters of the condition), or None if the integration failed.
+
+        """
+        return solve_condition_tree(self, x, y0)
+
+    def simulate_batch(self, X: np.ndarray, Y0: np.ndarray, _perturbation: dict = {}) -> np.ndarray:
+        """
+        Simulate a stack of parameter sets together.
+
+        Parameters
+        ----------
+        X : array, shape (n_sets, len(x))
+            Model parameters.
+
+        Y0 : array, shape (n_sets, len(y0)) or (len(y0),)
+            Initial values.
+
+        Returns
+        -------
+        simulations : array, shape (n_sets, len(observables), len(t), len(conditions))
+            Simulated values, NaN for parameter sets whose simulation failed.
+
+        """
+        return simulate_batch(self, X, Y0, _perturbation)
 
     @staticmethod
     def _solveode(
@@ -128,23 +205,7 @@ class NumericalSimulation(DifferentialEquation):
             Represents the solution of ODE.
 
         """
-        if options is None:
-            options = {}
-        options.setdefault("rtol", 1e-8)
-        options.setdefault("atol", 1e-8)
-        try:
-            sol = solve_ivp(
-                diffeq,
-                (t[0], t[-1]),
-                y0,
-                method=method,
-                t_eval=t,
-                args=f_params,
-                **options,
-            )
-            return sol if sol.success else None
-        except ValueError:
-            return None
+        return solve_ode(diffeq, y0, t, f_params, method, options)
 
     def _get_steady_state(
         self,
@@ -168,8 +229,10 @@ class NumericalSimulation(DifferentialEquation):
             Model parameters.
 
         eps : float (default: 1e-6)
-            Run until a time t for which the maximal absolute value of the
-            regularized relative derivative was smaller than eps.
+            Tolerance on the maximal absolute value of the regularized
+            relative derivative. The steady state is found by root finding;
+            if this fails, the system is integrated until the relative
+            change becomes smaller than eps.
 
         Returns
         -------
@@ -177,14 +240,7 @@ class NumericalSimulation(DifferentialEquation):
             Steady state concentrations of all species.
 
         """
-        while True:
-            sol = self._solveode(diffeq, y0, range(2), f_params)
-            if sol is None or np.max(np.abs((sol.y[:, -1] - y0) / (np.array(y0) + eps))) < eps:
-                break
-            else:
-                y0 = sol.y[:, -1].tolist()
-
-        return [] if sol is None else sol.y[:, -1].tolist()
+        return find_steady_state(diffeq, y0, f_params, eps, self._solveode)
 
 
 class ExperimentalData(object):
@@ -1,11 +1,13 @@
 import os
 from typing import List
 
-from .fitness import objective
+from biomass.solver import compile_diffeq
+
+from .fitness import compile_objective, objective, objective_batch
 from .name2idx import C, V
 from .observable import ExperimentalData, NumericalSimulation, observables
 from .reaction_network import ReactionNetwork
-from .set_model import initial_values, param_values
+from .set_model import DifferentialEquation, initial_values, param_values
 from .set_search_param import SearchParam
 from .viz import Visualization
 
@@ -27,6 +29,7 @@ class BioMassModel(object):
         self.pval = param_values
         self.ival = initial_values
         self.obj_func = objective
+        self.obj_func_batch = objective_batch
         self.sim = NumericalSimulation()
         self.exp = ExperimentalData()
         self.viz = Visualization()
@@ -44,7 +47,27 @@ def show_info() -> None:
     )
 
 
-def create() -> BioMassModel:
+def create(rhs_backend: str = "python", jacobian: bool = True) -> BioMassModel:
+    """
+    Create a BioMassModel.
+
+    Parameters
+    ----------
+    rhs_backend : str (default: 'python')
+        Implementation of DifferentialEquation.diffeq used by every simulation
+        of this model.
+            - 'python' : The rate equations as written in set_model.py.
+            - 'numpy' : Code generated from set_model.py with constant indices.
+            - 'numba' : The generated code compiled by numba (requires numba).
+
+    jacobian : bool (default: True)
+        Whether to pass the analytic Jacobian matrix generated from set_model.py,
+        together with its sparsity structure, to the stiff ODE solver.
+
+    """
+    DifferentialEquation.diffeq = compile_diffeq(
+        DifferentialEquation.diffeq, C, V, backend=rhs_backend, jacobian=jacobian
+    )
     model = BioMassModel()
     if model.sim.normalization:
         for obs_name in model.obs:
@@ -63,4 +86,5 @@ def create() -> BioMassModel:
                         raise ValueError(
                             f"Normalization condition '{c}' is not defined in sim.conditions."
                         )
+    compile_objective()
     return model
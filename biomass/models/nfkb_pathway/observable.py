@@ -1,7 +1,14 @@
 import numpy as np
-from scipy.integrate import solve_ivp
 from typing import List, Callable, Optional
 
+from biomass.solver import (
+    Branch,
+    find_steady_state,
+    simulate_batch,
+    solve_condition_tree,
+    solve_ode,
+)
+
 from .name2idx import C, V
 from .set_model import DifferentialEquation
 
@@ -12,6 +19,39 @@ observables = [
 ]
 
 
+def _add_dcf(x, y0):
+    x[C.uptake] = 1.0000
+    x[C.TNF] = 1.0000
+    x[C.trigger_iIkk] = 0.0195
+    x[C.deact_TNFR] = 0.0010
+    x[C.deact_ppIkk] = 0.1660
+    x[C.deact_pnNfk] = 1000.0000
+    x[C.act_Ikk_by_TNF] = 0.0347
+    x[C.act_pIkk] = 0.1603
+    x[C.act_Ikb_by_Ikk] = 0.1562
+    x[C.act_Nfk_by_Ikk] = 0.6438
+    x[C.act_Nfk_by_Ikk_complex] = 0.2816
+    x[C.act_Ikb_complex] = 1.3897
+    x[C.form_complex] = 2.8390
+    x[C.form_complex_nuc] = 1000.0000
+    x[C.ext_nNfkIkb] = 1000.0000
+    x[C.Vnuc] = 1.0000
+    x[C.split_NfkpIkb] = 0.0811
+    x[C.split_NfkIkb] = 1.0000
+    x[C.int_Nfk] = 0.0100
+    x[C.int_Ikb] = 0.1226
+    x[C.eta_int_pNfk] = 17.9585
+    x[C.degrad_Ikb] = 0.6308
+    x[C.degrad_mIkb] = 0.0053
+    x[C.degrad_RnaA20] = 0.0089
+    x[C.degrad_A20] = 0.0116
+    x[C.prod_Ikb] = 1.0000
+    x[C.prod_mIkb_by_nNfk] = 0.0020
+    x[C.build_RnaA20] = 1.0000
+    x[C.build_A20] = 0.0006
+    x[C.shuttle_RnaA20] = 0.0119
+
+
 class NumericalSimulation(DifferentialEquation):
     """Simulate a model using scipy.integrate.solve_ivp
 
@@ -28,10 +68,16 @@ class NumericalSimulation(DifferentialEquation):
             The experimental conditions to use for normalization.
             If empty, all conditions defined in sim.conditions will be used.
 
+    simulations : numpy array
+        Simulated values of observables, shape (len(observables), len(t), len(conditions)),
+        written by simulate(). Each instance owns its buffer; use
+        biomass.solver.SimulationContext to simulate from several threads.
+
     """
 
     def __init__(self):
         super().__init__(perturbation={})
+        self.simulations = np.empty((len(observables), len(self.t), len(self.conditions)))
         self.normalization = {}
 
     t = range(200 + 1)
@@ -39,57 +85,81 @@ class NumericalSimulation(DifferentialEquation):
     # Experimental conditions
     conditions = ["TNFa", "TNFa_DCF"]
 
-    simulations = np.empty((len(observables), len(t), len(conditions)))
+    # Both conditions start from y0
+    condition_tree = Branch("initial", children=(Branch("TNFa"), Branch("TNFa_DCF", update=_add_dcf)))
 
     def simulate(self, x, y0, _perturbation={}):
         if _perturbation:
             self.perturbation = _perturbation
+        solutions = self.solve_conditions(x, y0)
+        if solutions is None:
+            return False
         for i, condition in enumerate(self.conditions):
-            if condition == "TNFa":
-                pass
-            elif condition == "TNFa_DCF":
-                x[C.uptake] = 1.0000
-                x[C.TNF] = 1.0000
-                x[C.trigger_iIkk] = 0.0195
-                x[C.deact_TNFR] = 0.0010
-                x[C.deact_ppIkk] = 0.1660
-                x[C.deact_pnNfk] = 1000.0000
-                x[C.act_Ikk_by_TNF] = 0.0347
-                x[C.act_pIkk] = 0.1603
-                x[C.act_Ikb_by_Ikk] = 0.1562
-                x[C.act_Nfk_by_Ikk] = 0.6438
-                x[C.act_Nfk_by_Ikk_complex] = 0.2816
-                x[C.act_Ikb_complex] = 1.3897
-                x[C.form_complex] = 2.8390
-                x[C.form_complex_nuc] = 1000.0000
-                x[C.ext_nNfkIkb] = 1000.0000
-                x[C.Vnuc] = 1.0000
-                x[C.split_NfkpIkb] = 0.0811
-                x[C.split_NfkIkb] = 1.0000
-                x[C.int_Nfk] = 0.0100
-                x[C.int_Ikb] = 0.1226
-                x[C.eta_int_pNfk] = 17.9585
-                x[C.degrad_Ikb] = 0.6308
-                x[C.degrad_mIkb] = 0.0053
-                x[C.degrad_RnaA20] = 0.0089
-                x[C.degrad_A20] = 0.0116
-                x[C.prod_Ikb] = 1.0000
-                x[C.prod_mIkb_by_nNfk] = 0.0020
-                x[C.build_RnaA20] = 1.0000
-                x[C.build_A20] = 0.0006
-                x[C.shuttle_RnaA20] = 0.0119
-
-            sol = self._solveode(self.diffeq, y0, self.t, tuple(x))
-
-            if sol is None:
-                return False
-            else:
-                self.simulations[observables.index("nuclear_IkBa"), :, i] = x[C.Vnuc] * (
-                    sol.y[V.nNfkIkb, :] + sol.y[V.nIkb, :]
-                )
-                self.simulations[observables.index("nuclear_NFkB"), :, i] = x[C.Vnuc] * (
-                    sol.y[V.pnNfk, :] + sol.y[V.nNfk, :] + sol.y[V.nNfkIkb, :]
-                )
+            sol = solutions[condition]
+            x = sol.x
+            self.simulations[observables.index("nuclear_IkBa"), :, i] = x[C.Vnuc] * (
+                sol.y[V.nNfkIkb, :] + sol.y[V.nIkb, :]
+            )
+            self.simulations[observables.index("nuclear_NFkB"), :, i] = x[C.Vnuc] * (
+                sol.y[V.pnNfk, :] + sol.y[V.nNfk, :] + sol.y[V.nNfkIkb, :]
+            )
+
+    def set_timepoints(self, timepoints: List[float]) -> None:
+        """
+        Simulate only at the given time points, e.g., those compared with
+        experimental data in the objective function. The dense time course
+        of the class (NumericalSimulation.t) is not affected.
+
+        Parameters
+        ----------
+        timepoints : list
+            Time points to simulate, including the initial time.
+
+        """
+        self.t = sorted(set(timepoints))
+        self.simulations = np.empty((len(observables), len(self.t), len(self.conditions)))
+
+    def solve_conditions(self, x: list, y0: list) -> Optional[dict]:
+        """
+        Simulate the conditions described by condition_tree, integrating
+        shared segments of their trajectories only once.
+
+        Parameters
+        ----------
+        x : list
+            Model parameters.
+
+        y0 : list
+            Initial values.
+
+        Returns
+        -------
+        solutions : dict
+            For each condition, the solution with fields t, y and x (model
+            parameters of the condition), or None if the integration failed.
+
+        """
+        return solve_condition_tree(self, x, y0)
+
+    def simulate_batch(self, X: np.ndarray, Y0: np.ndarray, _perturbation: dict = {}) -> np.ndarray:
+        """
+        Simulate a stack of parameter sets together.
+
+        Parameters
+        ----------
+        X : array, shape (n_sets, len(x))
+            Model parameters.
+
+        Y0 : array, shape (n_sets, len(y0)) or (len(y0),)
+            Initial values.
+
+        Returns
+        -------
+        simulations : array, shape (n_sets, len(observables), len(t), len(conditions))
+            Simulated values, NaN for parameter sets whose simulation failed.
+
+        """
+        return simulate_batch(self, X, Y0, _perturbation)
 
     @staticmethod
     def _solveode(
@@ -129,23 +199,7 @@ class NumericalSimulation(DifferentialEquation):
             Represents the solution of ODE.
 
         """
-        if options is None:
-            options = {}
-        options.setdefault("rtol", 1e-8)
-        options.setdefault("atol", 1e-8)
-        try:
-            sol = solve_ivp(
-                diffeq,
-                (t[0], t[-1]),
-                y0,
-                method=method,
-                t_eval=t,
-                args=f_params,
-                **options,
-            )
-            return sol if sol.success else None
-        except ValueError:
-            return None
+        return solve_ode(diffeq, y0, t, f_params, method, options)
 
     def _get_steady_state(
         self,
@@ -169,8 +223,10 @@ class NumericalSimulation(DifferentialEquation):
             Model parameters.
 
         eps : float (default: 1e-6)
-            Run until a time t for which the maximal absolute value of the
-            regularized relative derivative was smaller than eps.
+            Tolerance on the maximal absolute value of the regularized
+            relative derivative. The steady state is found by root finding;
+            if this fails, the system is integrated until the relative
+            change becomes smaller than eps.
 
         Returns
         -------
@@ -178,14 +234,7 @@ class NumericalSimulation(DifferentialEquation):
             Steady state concentrations of all species.
 
         """
-        while True:
-            sol = self._solveode(diffeq, y0, range(2), f_params)
-            if sol is None or np.max(np.abs((sol.y[:, -1] - y0) / (np.array(y0) + eps))) < eps:
-                break
-            else:
-                y0 = sol.y[:, -1].tolist()
-
-        return [] if sol is None else sol.y[:, -1].tolist()
+        return find_steady_state(diffeq, y0, f_params, eps, self._solveode)
 
 
 class ExperimentalData(object):
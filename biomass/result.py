@@ -45,30 +45,8 @@ class OptimizationResults(ExecModel):
             )
             for i, param_index in enumerate(self.model.sp.idx_params):
                 for j, nth_paramset in enumerate(sorted(n_file), start=1):
-                    best_generation = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            "generation.npy",
-                        )
-                    )
-                    best_individual = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            f"fit_param{int(best_generation):d}.npy",
-                        )
-                    )
-                    error = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            "best_fitness.npy",
-                        )
-                    )
+                    best_individual = self.get_individual(nth_paramset)
+                    error = self.get_best_fitness(nth_paramset)
                     optimized_params[0, 0] = ""
                     optimized_params[1, 0] = "*Error*"
                     optimized_params[i + 2, 0] = self.model.parameters[param_index]
@@ -91,30 +69,8 @@ class OptimizationResults(ExecModel):
             )
             for i, specie_index in enumerate(self.model.sp.idx_initials):
                 for j, nth_paramset in enumerate(sorted(n_file), start=1):
-                    best_generation = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            "generation.npy",
-                        )
-                    )
-                    best_individual = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            f"fit_param{int(best_generation):d}.npy",
-                        )
-                    )
-                    error = np.load(
-                        os.path.join(
-                            self.model.path,
-                            "out",
-                            f"{nth_paramset:d}",
-                            "best_fitness.npy",
-                        )
-                    )
+                    best_individual = self.get_individual(nth_paramset)
+                    error = self.get_best_fitness(nth_paramset)
                     optimized_initials[0, 0] = ""
                     optimized_initials[1, 0] = "*Error*"
                     optimized_initials[i + 2, 0] = self.model.species[specie_index]
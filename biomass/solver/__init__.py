@@ -0,0 +1,7 @@
+from .batch import simulate_batch, solve_batch
+from .codegen import RHS_BACKENDS, compile_diffeq
+from .conditions import Branch, solve_condition_tree
+from .context import SimulationContext
+from .jacobian import compile_jacobian
+from .ode import solve_ode
+from .steady_state import SteadyStateCache, find_steady_state, steady_state_cache
@@ -0,0 +1,191 @@
+"""
+Simulation of many parameter sets at once.
+
+A stack of parameter sets is integrated as one block-diagonal system:
+species are stored as y[i] of shape (n_sets,), model parameters as x[k]
+of shape (n_sets,), and DifferentialEquation.diffeq is evaluated for all
+parameter sets with NumPy. NumericalSimulation.simulate runs unchanged on
+these arrays; the solution of each species then has shape (len(t), n_sets).
+"""
+import ast
+import inspect
+import textwrap
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.sparse import csc_matrix, identity, kron
+
+from .codegen import UniformConditions, _exec, _namespace
+
+__all__ = ["simulate_batch", "solve_batch"]
+
+
+@lru_cache(maxsize=None)
+def batch_diffeq(diffeq: Callable) -> Callable:
+    """DifferentialEquation.diffeq accepting arrays of parameter sets."""
+    module = ast.parse(textwrap.dedent(inspect.getsource(diffeq)))
+    funcdef = module.body[0]
+    funcdef.decorator_list = []
+    module = UniformConditions().visit(module)
+    return _exec(module, diffeq, _namespace(diffeq))[funcdef.name]
+
+
+def solve_batch(
+    diffeq: Callable,
+    y0: np.ndarray,
+    t: range,
+    f_params: tuple,
+    method: str = "BDF",
+    options: Optional[dict] = None,
+):
+    """
+    Solve the ODE system for a stack of parameter sets.
+
+    Parameters
+    ----------
+    diffeq : callable f(t, y, *x)
+        Right-hand side of the differential equation, a bound
+        DifferentialEquation.diffeq.
+
+    y0 : array, shape (n_species, n_sets)
+        Initial conditions.
+
+    t : array
+        A sequence of time points for which to solve for y.
+
+    f_params : tuple
+        Model parameters, each of which is a scalar or an array of shape (n_sets,).
+
+    method : str (default: "BDF")
+        Integration method to use.
+
+    options : dict, optional
+        Options passed to a chosen solver. Note that the local error is
+        controlled for all parameter sets together (root mean square).
+
+    Returns
+    -------
+    sol : OdeResult
+        sol.y has shape (n_species, len(t), n_sets), or None if the
+        integration failed.
+
+    """
+    y0 = np.asarray(y0, dtype=float)
+    n_species, n_sets = y0.shape
+    options = {} if options is None else dict(options)
+    owner = getattr(diffeq, "__self__", None)
+    kernel = batch_diffeq(inspect.unwrap(getattr(diffeq, "__func__", diffeq)))
+    x = tuple(np.broadcast_to(np.asarray(p, dtype=float), (n_sets,)) for p in f_params)
+
+    def fun(t, y):
+        dydt = np.empty((n_species, n_sets))
+        for i, value in enumerate(kernel(owner, t, y.reshape(n_species, n_sets), *x)):
+            dydt[i] = value
+        return dydt.ravel()
+
+    if method in ("BDF", "Radau"):
+        # Species-major layout: y[i * n_sets + s] is species i of parameter set s.
+        sparsity = getattr(diffeq, "jac_sparsity", None)
+        if sparsity is None:
+            sparsity = np.ones((n_species, n_species))
+        options.setdefault("jac_sparsity", kron(sparsity, identity(n_sets), format="csc"))
+        jac = getattr(diffeq, "jac", None)
+        if jac is not None and not getattr(owner, "perturbation", None):
+            offset = np.arange(n_sets)
+            rows = (jac.nonzeros[0][:, None] * n_sets + offset).ravel()
+            cols = (jac.nonzeros[1][:, None] * n_sets + offset).ravel()
+            shape = (n_species * n_sets, n_species * n_sets)
+
+            def jac_batch(t, y):
+                values = jac.batch(t, y.reshape(n_species, n_sets), x)
+                data = np.empty((len(values), n_sets))
+                for k, value in enumerate(values):
+                    data[k] = value
+                # SuperLU raises on NaN instead of letting the Newton iteration fail.
+                data[~np.isfinite(data)] = 0.0
+                return csc_matrix((data.ravel(), (rows, cols)), shape=shape)
+
+            options.setdefault("jac", jac_batch)
+    try:
+        sol = solve_ivp(fun, (t[0], t[-1]), y0.ravel(), method=method, t_eval=t, **options)
+    except (ValueError, RuntimeError):  # RuntimeError: singular sparse LU factor
+        return None
+    if not sol.success:
+        return None
+    sol.y = sol.y.reshape(n_species, n_sets, -1).transpose(0, 2, 1)
+    return sol
+
+
+def _simulate(sim, x, y0, _perturbation: dict, shape: tuple) -> Optional[np.ndarray]:
+    # Results are written to an instance attribute shadowing sim.simulations.
+    saved = vars(sim).get("simulations")
+    sim.simulations = np.empty(shape)
+    sim._batch = True
+    try:
+        if sim.simulate(x, y0, _perturbation) is not None:
+            return None
+        return sim.simulations
+    finally:
+        del sim._batch
+        if saved is None:
+            del sim.simulations
+        else:
+            sim.simulations = saved
+
+
+def simulate_batch(
+    sim,
+    X: np.ndarray,
+    Y0: np.ndarray,
+    _perturbation: dict = {},
+) -> np.ndarray:
+    """
+    Simulate a stack of parameter sets with NumericalSimulation.simulate.
+
+    Parameter sets are integrated together; if this fails, e.g., because a
+    condition in the rate equations differs between them, the stack is
+    split in half until the parameter sets are simulated one by one.
+
+    Parameters
+    ----------
+    sim : NumericalSimulation
+        Numerical simulation of a model.
+
+    X : array, shape (n_sets, len(x))
+        Model parameters.
+
+    Y0 : array, shape (n_sets, len(y0)) or (len(y0),)
+        Initial values.
+
+    Returns
+    -------
+    simulations : array, shape (n_sets, len(observables), len(t), len(conditions))
+        Simulated values, NaN for parameter sets whose simulation failed.
+
+    """
+    if getattr(sim, "_batch", False):
+        raise RuntimeError("simulate_batch cannot be called during a simulation.")
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    Y0 = np.asarray(Y0, dtype=float)
+    if Y0.ndim == 1:
+        Y0 = np.tile(Y0, (len(X), 1))
+    if len(X) != len(Y0):
+        raise ValueError("X and Y0 must have the same number of parameter sets.")
+    shape = sim.simulations.shape
+    simulations = np.full((len(X),) + shape, np.nan)
+    stack: List[np.ndarray] = [np.arange(len(X))] if len(X) else []
+    while stack:
+        idx = stack.pop()
+        if len(idx) == 1:
+            res = _simulate(sim, X[idx[0]].tolist(), Y0[idx[0]].tolist(), _perturbation, shape)
+            if res is not None:
+                simulations[idx[0]] = res
+            continue
+        res = _simulate(sim, X[idx].T.copy(), Y0[idx].T.copy(), _perturbation, shape + (len(idx),))
+        if res is not None:
+            simulations[idx] = np.moveaxis(res, -1, 0)
+        else:
+            stack.extend(np.array_split(idx, 2)[::-1])
+    return simulations
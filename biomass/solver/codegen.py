@@ -0,0 +1,424 @@
+"""
+Code generation from the rate equations written in set_model.py.
+
+DifferentialEquation.diffeq is parsed once and rewritten so that
+    - parameter and species indices (C.*, V.*) become integer constants,
+    - the flux dictionary `v` becomes plain local variables,
+    - the perturbation block used for reaction sensitivity analysis
+      falls back to the original Python implementation.
+"""
+import ast
+import inspect
+import textwrap
+import warnings
+from functools import lru_cache
+from types import FunctionType, ModuleType
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+__all__ = ["RHS_BACKENDS", "compile_diffeq"]
+
+RHS_BACKENDS = ("python", "numpy", "numba")
+
+_NUMPY_TEMPLATE = """
+def diffeq(self, t, _y, *x):
+    if len(x) == 1 and x[0].__class__ is _PackedParams:
+        x = x[0]
+    if self.perturbation:
+        return _python_diffeq(self, t, _y, *x)
+    y = _y.tolist() if _y.__class__ is _ndarray else _y
+    try:
+        pass
+    except (ZeroDivisionError, OverflowError):
+        return _python_diffeq(self, t, _np.asarray(_y, dtype=float), *x)
+"""
+
+_NUMBA_TEMPLATE = """
+def _kernel(t, y, x):
+    pass
+
+def diffeq(self, t, y, *x):
+    if len(x) == 1 and x[0].__class__ is _ndarray:
+        x = x[0]
+    else:
+        x = _np.asarray(x, dtype=_np.float64)
+    if self.perturbation:
+        return _python_diffeq(self, t, y, *x)
+    return _kernel(t, _np.asarray(y, dtype=_np.float64), x)
+"""
+
+
+class _PackedParams(list):
+    """Model parameters converted to Python floats once per integration."""
+
+
+def _pack_floats(f_params: tuple) -> tuple:
+    return (_PackedParams(map(float, f_params)),)
+
+
+def _pack_array(f_params: tuple) -> tuple:
+    return (np.asarray(f_params, dtype=np.float64),)
+
+
+def _pow(base, exponent):
+    """Power with NumPy semantics, i.e., NaN instead of complex numbers."""
+    res = base ** exponent
+    return res if res.__class__ is not complex else np.nan
+
+
+def _literal(node: ast.AST):
+    """Return the Python literal represented by node, or None."""
+    if hasattr(ast, "Index") and isinstance(node, ast.Index):  # Python < 3.9
+        node = node.value
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def _uses_perturbation(node: ast.AST) -> bool:
+    return any(
+        isinstance(child, ast.Attribute)
+        and child.attr == "perturbation"
+        and isinstance(child.value, ast.Name)
+        and child.value.id == "self"
+        for child in ast.walk(node)
+    )
+
+
+class RateEquationTransformer(ast.NodeTransformer):
+    """
+    Rewrite the body of DifferentialEquation.diffeq.
+
+    Parameters
+    ----------
+    index_modules : dict
+        Global names bound to name2idx.parameters (C) and name2idx.species (V).
+
+    Attributes
+    ----------
+    flux_name : str, optional
+        Name of the flux dictionary, e.g., 'v'.
+
+    uses_perturbation : bool
+        Whether the original code reads self.perturbation.
+
+    """
+
+    def __init__(self, index_modules: Dict[str, ModuleType]) -> None:
+        self.index_modules = index_modules
+        self.flux_name: Optional[str] = None
+        self.uses_perturbation: bool = False
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        if isinstance(node.value, ast.Name) and node.value.id in self.index_modules:
+            value = getattr(self.index_modules[node.value.id], node.attr)
+            if isinstance(value, int):
+                return ast.copy_location(ast.Constant(value=value), node)
+        return self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign) -> Optional[ast.AST]:
+        if (
+            len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and isinstance(node.value, ast.Dict)
+            and not node.value.keys
+        ):
+            self.flux_name = node.targets[0].id
+            return None
+        return self.generic_visit(node)
+
+    def visit_Subscript(self, node: ast.Subscript) -> ast.AST:
+        node = self.generic_visit(node)
+        if isinstance(node.value, ast.Name) and node.value.id == self.flux_name:
+            idx = _literal(node.slice)
+            if not isinstance(idx, int):
+                raise ValueError(
+                    f"Unable to compile diffeq: '{self.flux_name}' must be indexed by integers."
+                )
+            return ast.copy_location(ast.Name(id=f"_v{idx:d}", ctx=node.ctx), node)
+        return node
+
+    def visit_If(self, node: ast.If) -> Optional[ast.AST]:
+        if _uses_perturbation(node.test):
+            self.uses_perturbation = True
+            return None
+        return self.generic_visit(node)
+
+    def visit_Expr(self, node: ast.Expr) -> Optional[ast.AST]:
+        if isinstance(_literal(node.value), str):
+            return None  # docstrings and commented-out blocks
+        return self.generic_visit(node)
+
+
+class _NumpyPow(ast.NodeTransformer):
+    """Replace a ** b with _pow(a, b) unless b is an integral literal."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            exponent = _literal(node.right)
+            if isinstance(exponent, (int, float)) and float(exponent).is_integer():
+                return node
+            return ast.copy_location(
+                ast.Call(
+                    func=ast.Name(id="_pow", ctx=ast.Load()),
+                    args=[node.left, node.right],
+                    keywords=[],
+                ),
+                node,
+            )
+        return node
+
+
+class BranchNotUniform(ValueError):
+    """A condition in the rate equations differs between parameter sets."""
+
+
+def _uniform(condition) -> bool:
+    """Truth value of a condition evaluated for a batch of parameter sets."""
+    condition = np.asarray(condition)
+    if condition.all():
+        return True
+    if not condition.any():
+        return False
+    raise BranchNotUniform("The condition differs between parameter sets.")
+
+
+class UniformConditions(ast.NodeTransformer):
+    """
+    Wrap the conditions of if statements with _uniform so that the rate
+    equations accept arrays of parameter sets, e.g., y[V.A] of shape (n_sets,).
+    Conditions on self.perturbation are left as they are.
+    """
+
+    def _test(self, node: ast.expr) -> ast.expr:
+        if isinstance(node, ast.BoolOp):
+            node.values = [self._test(value) for value in node.values]
+            return node
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            node.operand = self._test(node.operand)
+            return node
+        return ast.Call(func=ast.Name(id="_uniform", ctx=ast.Load()), args=[node], keywords=[])
+
+    def visit_If(self, node: ast.If) -> ast.AST:
+        node = self.generic_visit(node)
+        if not _uses_perturbation(node.test):
+            node.test = self._test(node.test)
+        return node
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        node = self.generic_visit(node)
+        node.test = self._test(node.test)
+        return node
+
+
+class _NumbaArrays(ast.NodeTransformer):
+    """Replace dydt = [0] * n with dydt = _np.zeros(n)."""
+
+    def visit_Assign(self, node: ast.Assign) -> ast.AST:
+        value = node.value
+        if (
+            isinstance(value, ast.BinOp)
+            and isinstance(value.op, ast.Mult)
+            and isinstance(value.left, ast.List)
+            and isinstance(_literal(value.right), int)
+        ):
+            node.value = ast.copy_location(
+                ast.Call(
+                    func=ast.Attribute(
+                        value=ast.Name(id="_np", ctx=ast.Load()), attr="zeros", ctx=ast.Load()
+                    ),
+                    args=[value.right],
+                    keywords=[],
+                ),
+                value,
+            )
+        return node
+
+
+def parse_diffeq(diffeq: Callable, C: ModuleType, V: ModuleType) -> ast.FunctionDef:
+    """
+    Parse DifferentialEquation.diffeq and simplify its body.
+
+    Parameters
+    ----------
+    diffeq : callable f(self, t, y, *x)
+        Right-hand side of the differential equation.
+
+    C, V : module
+        name2idx.parameters and name2idx.species.
+
+    Returns
+    -------
+    funcdef : ast.FunctionDef
+        Function definition whose attribute `uses_perturbation` is set.
+
+    """
+    source = textwrap.dedent(inspect.getsource(diffeq))
+    funcdef = ast.parse(source).body[0]
+    if not isinstance(funcdef, ast.FunctionDef):
+        raise ValueError("Unable to compile diffeq: not a function definition.")
+    args = funcdef.args
+    if [arg.arg for arg in args.args] != ["self", "t", "y"] or args.vararg is None:
+        raise ValueError("Unable to compile diffeq: signature must be diffeq(self, t, y, *x).")
+    if args.vararg.arg != "x":
+        raise ValueError("Unable to compile diffeq: model parameters must be named x.")
+    index_modules = {name: obj for name, obj in diffeq.__globals__.items() if obj is C or obj is V}
+    transformer = RateEquationTransformer(index_modules)
+    body: List[ast.stmt] = []
+    for stmt in funcdef.body:
+        stmt = transformer.visit(stmt)
+        if stmt is not None:
+            body.append(stmt)
+    funcdef.body = body
+    funcdef.decorator_list = []
+    funcdef.uses_perturbation = transformer.uses_perturbation
+    return funcdef
+
+
+def _remove_perturbation_guard(wrapper: ast.FunctionDef) -> None:
+    wrapper.body = [
+        stmt
+        for stmt in wrapper.body
+        if not (isinstance(stmt, ast.If) and _uses_perturbation(stmt.test))
+    ]
+
+
+def _exec(module: ast.Module, diffeq: Callable, namespace: dict) -> dict:
+    ast.fix_missing_locations(module)
+    code = compile(module, filename=f"<biomass: {diffeq.__qualname__}>", mode="exec")
+    exec(code, namespace)
+    return namespace
+
+
+def _namespace(diffeq: Callable) -> dict:
+    namespace = dict(diffeq.__globals__)
+    namespace.update(
+        _python_diffeq=diffeq,
+        _np=np,
+        _ndarray=np.ndarray,
+        _PackedParams=_PackedParams,
+        _pow=_pow,
+        _uniform=_uniform,
+    )
+    return namespace
+
+
+def _compile_numpy(diffeq: Callable, C: ModuleType, V: ModuleType) -> Callable:
+    funcdef = parse_diffeq(diffeq, C, V)
+    module = ast.parse(_NUMPY_TEMPLATE)
+    wrapper = module.body[0]
+    if not funcdef.uses_perturbation:
+        _remove_perturbation_guard(wrapper)
+    try_block = next(stmt for stmt in wrapper.body if isinstance(stmt, ast.Try))
+    try_block.body = [_NumpyPow().visit(stmt) for stmt in funcdef.body]
+    return _exec(module, diffeq, _namespace(diffeq))["diffeq"]
+
+
+def _compile_numba(diffeq: Callable, C: ModuleType, V: ModuleType) -> Callable:
+    try:
+        import numba
+    except ImportError as e:
+        raise ImportError("rhs_backend='numba' requires numba: pip install numba") from e
+    funcdef = parse_diffeq(diffeq, C, V)
+    if any(isinstance(node, ast.Name) and node.id == "self" for node in ast.walk(funcdef)):
+        raise ValueError(
+            "Unable to compile diffeq: 'self' cannot be used with rhs_backend='numba'."
+        )
+    module = ast.parse(_NUMBA_TEMPLATE)
+    kernel, wrapper = module.body
+    kernel.body = [_NumbaArrays().visit(stmt) for stmt in funcdef.body]
+    if not funcdef.uses_perturbation:
+        _remove_perturbation_guard(wrapper)
+    namespace = _exec(module, diffeq, _namespace(diffeq))
+    namespace["_kernel"] = numba.njit(error_model="numpy")(namespace["_kernel"])
+    return namespace["diffeq"]
+
+
+def _copy_function(diffeq: Callable) -> Callable:
+    copied = FunctionType(
+        diffeq.__code__,
+        diffeq.__globals__,
+        diffeq.__name__,
+        diffeq.__defaults__,
+        diffeq.__closure__,
+    )
+    copied.__qualname__ = diffeq.__qualname__
+    return copied
+
+
+@lru_cache(maxsize=None)
+def _compile(
+    diffeq: Callable, C: ModuleType, V: ModuleType, backend: str, jacobian: bool
+) -> Callable:
+    if backend == "python":
+        compiled = _copy_function(diffeq)
+    elif backend == "numpy":
+        compiled = _compile_numpy(diffeq, C, V)
+        compiled.pack = _pack_floats
+    else:
+        compiled = _compile_numba(diffeq, C, V)
+        compiled.pack = _pack_array
+    if jacobian:
+        from .jacobian import compile_jacobian
+
+        compiled.jac, compiled.jac_sparsity, reason = compile_jacobian(
+            diffeq, C, V, "numba" if backend == "numba" else "numpy"
+        )
+        if reason is not None:
+            warnings.warn(
+                f"Analytic Jacobian is not available ({reason.rstrip('.')}); "
+                "it is approximated by finite differences.",
+                RuntimeWarning,
+            )
+    compiled.__wrapped__ = diffeq
+    compiled.__doc__ = diffeq.__doc__
+    compiled.backend = backend
+    return compiled
+
+
+def compile_diffeq(
+    diffeq: Callable,
+    C: ModuleType,
+    V: ModuleType,
+    backend: str = "numpy",
+    jacobian: bool = False,
+) -> Callable:
+    """
+    Generate a right-hand side kernel equivalent to DifferentialEquation.diffeq.
+
+    Parameters
+    ----------
+    diffeq : callable f(self, t, y, *x)
+        DifferentialEquation.diffeq, or a function previously returned by compile_diffeq.
+
+    C, V : module
+        name2idx.parameters and name2idx.species.
+
+    backend : str (default: 'numpy')
+        - 'python' : The original implementation.
+        - 'numpy' : Python code with constant indices and local fluxes.
+        - 'numba' : The same code compiled by numba (requires numba).
+
+    jacobian : bool (default: False)
+        Whether to generate the analytic Jacobian matrix, d(dydt)/dy.
+
+    Returns
+    -------
+    diffeq : callable f(self, t, y, *x)
+        Drop-in replacement for DifferentialEquation.diffeq. Compiled kernels
+        also provide `pack(f_params)`, which converts model parameters once
+        per integration; the packed tuple can be passed as `args` to solve_ivp.
+        If `jacobian` is True, `jac(t, y, *x)` and `jac_sparsity` are also
+        provided (see compile_jacobian); `jac` is None if the rate equations
+        cannot be differentiated.
+
+    """
+    if backend not in RHS_BACKENDS:
+        raise ValueError(f"rhs_backend must be one of {', '.join(RHS_BACKENDS)}.")
+    diffeq = inspect.unwrap(diffeq)
+    if backend == "python" and not jacobian:
+        return diffeq
+    return _compile(diffeq, C, V, backend, jacobian)
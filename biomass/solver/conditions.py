@@ -0,0 +1,179 @@
+"""
+Declarative execution of experimental conditions.
+
+Conditions of a model often share a part of their trajectories, e.g., the
+steady state without stimulus, or the time course before a drug is added to
+some of the samples. A condition tree describes each condition as a path of
+Branch objects from the root: every branch departs from the trajectory of its
+parent at a given time, optionally after updating model parameters and
+species. Shared segments are integrated only once.
+
+Examples
+--------
+>>> def no_ligand(x, y0):
+...     x[C.Ligand] = x[C.no_ligand]
+...
+>>> def egf(x, y0):
+...     x[C.Ligand] = x[C.EGF]
+...
+>>> def hrg(x, y0):
+...     x[C.Ligand] = x[C.HRG]
+...
+>>> condition_tree = Branch(
+...     "untreated",
+...     update=no_ligand,
+...     steady_state=True,
+...     children=(Branch("EGF", update=egf), Branch("HRG", update=hrg)),
+... )
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+__all__ = ["Branch", "solve_condition_tree"]
+
+
+@dataclass(frozen=True)
+class Branch(object):
+    """
+    Node of a condition tree.
+
+    Attributes
+    ----------
+    name : str
+        Name of the condition if the branch is a leaf, one of
+        NumericalSimulation.conditions, otherwise a label.
+
+    time : float (default: 0)
+        Time at which the branch departs from the trajectory of its parent.
+
+    update : callable f(x, y), optional
+        Modifies model parameters and species in place at `time`.
+        The changes are visible to this branch and its children only.
+
+    steady_state : bool (default: False)
+        Whether to replace species by the steady state after `update`.
+        Only allowed at the first time point.
+
+    children : tuple of Branch
+        Branches departing from this one.
+
+    """
+
+    name: str
+    time: float = 0
+    update: Optional[Callable[[list, list], None]] = None
+    steady_state: bool = False
+    children: Tuple["Branch", ...] = ()
+
+    def leaves(self) -> List["Branch"]:
+        if not self.children:
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+
+def _validate(sim, root: Branch) -> None:
+    names = [leaf.name for leaf in root.leaves()]
+    if sorted(names) != sorted(sim.conditions):
+        raise ValueError(
+            "Leaves of the condition tree must match conditions: {} != {}".format(
+                names, list(sim.conditions)
+            )
+        )
+    stack = [(root, sim.t[0])]
+    while stack:
+        branch, t_start = stack.pop()
+        if not t_start <= branch.time <= sim.t[-1]:
+            raise ValueError(
+                "Branch '{}' departs at {} outside [{}, {}].".format(
+                    branch.name, branch.time, t_start, sim.t[-1]
+                )
+            )
+        if branch.steady_state and branch.time != sim.t[0]:
+            raise ValueError(
+                "Steady state of branch '{}' must be computed at {}.".format(branch.name, sim.t[0])
+            )
+        stack.extend((child, branch.time) for child in branch.children)
+
+
+def _solve(
+    sim,
+    branch: Branch,
+    x,
+    y,
+    trajectory: np.ndarray,
+    solutions: Dict[str, OptimizeResult],
+) -> bool:
+    x = x.copy()
+    y = y.copy()
+    if branch.update is not None:
+        branch.update(x, y)
+    if branch.steady_state:
+        y = sim._get_steady_state(sim.diffeq, y, tuple(x))
+        if not len(y):
+            return False
+    t = np.asarray(sim.t, dtype=float)
+    t_end = max(child.time for child in branch.children) if branch.children else t[-1]
+    segment = (t >= branch.time) & (t <= t_end)
+    t_eval = np.unique(np.concatenate(([branch.time, t_end], t[segment])))
+    t_eval = np.union1d(t_eval, [child.time for child in branch.children])
+    if len(t_eval) > 1:
+        sol = sim._solveode(sim.diffeq, y, t_eval, tuple(x))
+        if sol is None:
+            return False
+        states = sol.y
+    else:
+        states = np.asarray(y, dtype=float)[:, None]
+    trajectory[:, segment] = states[:, np.searchsorted(t_eval, t[segment])]
+    if not branch.children:
+        solutions[branch.name] = OptimizeResult(t=t, y=trajectory, x=x)
+        return True
+    for child in branch.children:
+        y_child = states[:, np.searchsorted(t_eval, child.time)]
+        if not _solve(
+            sim,
+            child,
+            x,
+            y_child if np.ndim(y) == 2 else y_child.tolist(),
+            trajectory.copy(),
+            solutions,
+        ):
+            return False
+    return True
+
+
+def solve_condition_tree(sim, x, y0) -> Optional[Dict[str, OptimizeResult]]:
+    """
+    Simulate all conditions described by sim.condition_tree.
+
+    Parameters
+    ----------
+    sim : NumericalSimulation
+        Numerical simulation of a model.
+
+    x : list
+        Model parameters.
+
+    y0 : list
+        Initial values.
+
+    Returns
+    -------
+    solutions : dict
+        For each condition, an OptimizeResult with fields `t` (sim.t),
+        `y` (species, shape (len(y0), len(sim.t))) and `x` (parameters
+        after all updates on the path to the condition), or None if the
+        integration failed.
+
+    """
+    root = getattr(sim, "condition_tree", None)
+    if root is None:
+        raise ValueError("condition_tree is not defined.")
+    _validate(sim, root)
+    trajectory = np.empty((len(y0), len(sim.t)) + np.shape(y0)[1:])
+    solutions: Dict[str, OptimizeResult] = {}
+    if not _solve(sim, root, x, y0, trajectory, solutions):
+        return None
+    return solutions
@@ -0,0 +1,71 @@
+"""
+Reentrant simulation of a model.
+
+NumericalSimulation.simulate writes into the buffer sim.simulations, so one
+instance cannot be shared by concurrent callers. A SimulationContext gives
+every thread its own NumericalSimulation, created once and reused by all
+subsequent calls from that thread, so that simulations run in parallel
+without allocating a new output buffer or copying the results.
+
+Examples
+--------
+>>> context = SimulationContext(NumericalSimulation)
+>>> simulations = context.simulate(x, y0)  # Valid until the next call in this thread
+"""
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+__all__ = ["SimulationContext"]
+
+
+class SimulationContext(object):
+    """
+    Per-thread simulations of a model.
+
+    Parameters
+    ----------
+    factory : callable
+        Returns a new NumericalSimulation, e.g., the class itself or a
+        function that also calls NumericalSimulation.set_timepoints.
+
+    """
+
+    def __init__(self, factory: Callable[[], object]) -> None:
+        self._factory = factory
+        self._local = threading.local()
+
+    @property
+    def sim(self):
+        """NumericalSimulation of the calling thread."""
+        sim = getattr(self._local, "sim", None)
+        if sim is None:
+            sim = self._factory()
+            self._local.sim = sim
+        return sim
+
+    def simulate(self, x: list, y0: list, _perturbation: dict = {}) -> Optional[np.ndarray]:
+        """
+        Simulate a model in the NumericalSimulation of the calling thread.
+
+        Parameters
+        ----------
+        x : list
+            Model parameters.
+
+        y0 : list
+            Initial values.
+
+        Returns
+        -------
+        simulations : numpy array or None
+            sim.simulations of the calling thread, or None if the simulation
+            failed. The array is overwritten by the next call from the same
+            thread; copy it to keep the results.
+
+        """
+        sim = self.sim
+        if sim.simulate(x, y0, _perturbation) is not None:
+            return None
+        return sim.simulations
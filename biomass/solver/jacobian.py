@@ -0,0 +1,525 @@
+"""
+Analytic Jacobian of the rate equations written in set_model.py.
+
+The body of DifferentialEquation.diffeq, simplified by parse_diffeq, is
+differentiated with respect to y in forward mode: for every local variable
+`a` and every species `j` on which `a` depends, a new local `_d_a_j` holding
+d(a)/d(y[j]) is assigned next to `a`. Branches are differentiated separately
+and their dependencies are merged, so the sparsity pattern obtained in the
+same pass is valid for all parameter values and time points.
+"""
+import ast
+import copy
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from .codegen import (
+    UniformConditions,
+    _exec,
+    _literal,
+    _namespace,
+    _NumpyPow,
+    parse_diffeq,
+)
+
+__all__ = ["compile_jacobian"]
+
+_PYTHON_TEMPLATE = """
+def _kernel(t, y, x):
+    pass
+
+def jac(t, _y, *x):
+    if len(x) == 1 and x[0].__class__ in (_PackedParams, _ndarray):
+        x = x[0]
+    try:
+        return _kernel(t, _np.asarray(_y, dtype=float).tolist(), x)
+    except (ZeroDivisionError, OverflowError):
+        return _kernel(
+            t, list(_np.asarray(_y, dtype=float)), list(_np.asarray(x, dtype=float))
+        )
+"""
+
+_NUMBA_TEMPLATE = """
+def _kernel(t, y, x):
+    pass
+
+def jac(t, y, *x):
+    if len(x) == 1 and x[0].__class__ is _ndarray:
+        x = x[0]
+    else:
+        x = _np.asarray(x, dtype=_np.float64)
+    return _kernel(t, _np.asarray(y, dtype=_np.float64), x)
+"""
+
+# d/du f(u) for the elementary functions available as np.*, math.* or builtins.
+_DERIVATIVES = {
+    "exp": lambda u: _call("exp", u),
+    "log": lambda u: _div(ast.Constant(value=1.0), u),
+    "sqrt": lambda u: _div(ast.Constant(value=0.5), _call("sqrt", u)),
+}
+
+
+class JacobianUnavailable(Exception):
+    """The rate equations contain code that cannot be differentiated."""
+
+
+def _call(name: str, arg: ast.expr) -> ast.expr:
+    func = ast.Attribute(value=ast.Name(id="_np", ctx=ast.Load()), attr=name, ctx=ast.Load())
+    return ast.Call(func=func, args=[arg], keywords=[])
+
+
+def _is_number(node: ast.expr, value: float) -> bool:
+    return isinstance(node, ast.Constant) and node.value == value
+
+
+def _add(a: ast.expr, b: ast.expr) -> ast.expr:
+    return ast.BinOp(left=a, op=ast.Add(), right=b)
+
+
+def _sub(a: ast.expr, b: ast.expr) -> ast.expr:
+    return ast.BinOp(left=a, op=ast.Sub(), right=b)
+
+
+def _mul(a: ast.expr, b: ast.expr) -> ast.expr:
+    if _is_number(a, 1):
+        return b
+    if _is_number(b, 1):
+        return a
+    return ast.BinOp(left=a, op=ast.Mult(), right=b)
+
+
+def _div(a: ast.expr, b: ast.expr) -> ast.expr:
+    return ast.BinOp(left=a, op=ast.Div(), right=b)
+
+
+def _neg(a: ast.expr) -> ast.expr:
+    return ast.UnaryOp(op=ast.USub(), operand=a)
+
+
+def _func_name(func: ast.expr) -> Optional[str]:
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+        if func.value.id in ("np", "numpy", "math"):
+            return func.attr
+    return None
+
+
+class _Differentiator(object):
+    """
+    Forward-mode differentiation of straight-line code with branches.
+
+    Parameters
+    ----------
+    n_species : int
+        Length of y.
+
+    symbolic : bool
+        If False, only dependencies are tracked and no code is generated,
+        which is enough to obtain the sparsity pattern.
+
+    """
+
+    def __init__(self, n_species: int, symbolic: bool = True) -> None:
+        self.n_species = n_species
+        self.symbolic = symbolic
+        # Local variable (or array element 'dydt[i]') -> species it depends on
+        self.deps: Dict[str, Set[int]] = {}
+        # Arrays initialized as [0] * n, e.g., dydt
+        self.arrays: Dict[str, int] = {}
+        self.returned: Optional[str] = None
+
+    @staticmethod
+    def dname(key: str, j: int) -> str:
+        return "_d_" + key.replace("[", "_").replace("]", "") + f"_{j:d}"
+
+    def _seed(self, key: str) -> Dict[int, ast.expr]:
+        return {j: ast.Name(id=self.dname(key, j), ctx=ast.Load()) for j in self.deps[key]}
+
+    def _element(self, node: ast.Subscript) -> Optional[str]:
+        if isinstance(node.value, ast.Name) and node.value.id in self.arrays:
+            idx = _literal(node.slice)
+            if not isinstance(idx, int):
+                raise JacobianUnavailable(f"'{node.value.id}' must be indexed by integers.")
+            return f"{node.value.id}[{idx:d}]"
+        return None
+
+    def d(self, node: ast.expr) -> Dict[int, ast.expr]:
+        """Return {j: d(node)/d(y[j])} for all j with a nonzero derivative."""
+        if isinstance(node, ast.Constant):
+            return {}
+        if isinstance(node, ast.Name):
+            if node.id == "y":
+                raise JacobianUnavailable("y must be indexed by integers.")
+            return self._seed(node.id) if node.id in self.deps else {}
+        if isinstance(node, ast.Subscript):
+            if isinstance(node.value, ast.Name) and node.value.id == "y":
+                idx = _literal(node.slice)
+                if not isinstance(idx, int) or not 0 <= idx < self.n_species:
+                    raise JacobianUnavailable("y must be indexed by integers.")
+                return {idx: ast.Constant(value=1.0)}
+            key = self._element(node)
+            if key is not None:
+                return self._seed(key) if key in self.deps else {}
+            if self._depends(node):
+                raise JacobianUnavailable(f"Unsupported expression: {ast.dump(node)}")
+            return {}
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            du = self.d(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return du
+            return {j: _neg(e) for j, e in du.items()}
+        if isinstance(node, ast.BinOp):
+            return self._binop(node)
+        if isinstance(node, ast.IfExp):
+            if self._depends(node.test):
+                raise JacobianUnavailable("Conditions must not depend on y.")
+            d_body, d_orelse = self.d(node.body), self.d(node.orelse)
+            return {
+                j: ast.IfExp(
+                    test=copy.deepcopy(node.test),
+                    body=d_body.get(j, ast.Constant(value=0.0)),
+                    orelse=d_orelse.get(j, ast.Constant(value=0.0)),
+                )
+                for j in sorted(set(d_body) | set(d_orelse))
+            }
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        if self._depends(node):
+            raise JacobianUnavailable(f"Unsupported expression: {ast.dump(node)}")
+        return {}
+
+    def _depends(self, node: ast.AST) -> bool:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and (child.id == "y" or self.deps.get(child.id)):
+                return True
+            if isinstance(child, ast.Subscript):
+                key = self._element(child)
+                if key is not None and self.deps.get(key):
+                    return True
+        return False
+
+    def _binop(self, node: ast.BinOp) -> Dict[int, ast.expr]:
+        da, db = self.d(node.left), self.d(node.right)
+        if not self.symbolic:
+            return {j: None for j in set(da) | set(db)}
+        a, b = node.left, node.right
+        res: Dict[int, ast.expr] = {}
+        for j in sorted(set(da) | set(db)):
+            dja, djb = da.get(j), db.get(j)
+            if isinstance(node.op, (ast.Add, ast.Sub)):
+                if djb is None:
+                    res[j] = dja
+                elif dja is None:
+                    res[j] = djb if isinstance(node.op, ast.Add) else _neg(djb)
+                else:
+                    res[j] = (_add if isinstance(node.op, ast.Add) else _sub)(dja, djb)
+            elif isinstance(node.op, ast.Mult):
+                terms = []
+                if dja is not None:
+                    terms.append(_mul(dja, copy.deepcopy(b)))
+                if djb is not None:
+                    terms.append(_mul(copy.deepcopy(a), djb))
+                res[j] = terms[0] if len(terms) == 1 else _add(*terms)
+            elif isinstance(node.op, ast.Div):
+                if djb is None:
+                    res[j] = _div(dja, copy.deepcopy(b))
+                else:
+                    # (a/b)' = (a' - (a/b) b') / b
+                    quotient = _mul(_div(copy.deepcopy(a), copy.deepcopy(b)), djb)
+                    numerator = _neg(quotient) if dja is None else _sub(dja, quotient)
+                    res[j] = _div(numerator, copy.deepcopy(b))
+            elif isinstance(node.op, ast.Pow):
+                res[j] = self._pow(a, b, dja, djb)
+            else:
+                raise JacobianUnavailable(f"Unsupported operator: {type(node.op).__name__}")
+        return res
+
+    @staticmethod
+    def _pow(a: ast.expr, b: ast.expr, da: Optional[ast.expr], db: Optional[ast.expr]) -> ast.expr:
+        power = ast.BinOp(left=copy.deepcopy(a), op=ast.Pow(), right=copy.deepcopy(b))
+        if db is None:
+            exponent = _literal(b)
+            if isinstance(exponent, (int, float)):
+                if exponent == 1:
+                    return da
+                reduced = ast.BinOp(
+                    left=copy.deepcopy(a), op=ast.Pow(), right=ast.Constant(value=exponent - 1)
+                )
+                return _mul(_mul(ast.Constant(value=exponent), reduced), da)
+            reduced = ast.BinOp(
+                left=copy.deepcopy(a),
+                op=ast.Pow(),
+                right=_sub(copy.deepcopy(b), ast.Constant(value=1.0)),
+            )
+            return _mul(_mul(copy.deepcopy(b), reduced), da)
+        # (a^b)' = a^b (b' log(a) + b a' / a)
+        term = _mul(db, _call("log", copy.deepcopy(a)))
+        if da is not None:
+            term = _add(term, _div(_mul(copy.deepcopy(b), da), copy.deepcopy(a)))
+        return _mul(power, term)
+
+    def _call(self, node: ast.Call) -> Dict[int, ast.expr]:
+        if not any(self._depends(arg) for arg in node.args) and not any(
+            self._depends(kw.value) for kw in node.keywords
+        ):
+            return {}
+        name = _func_name(node.func)
+        if name not in _DERIVATIVES or len(node.args) != 1 or node.keywords:
+            if not self.symbolic:
+                res: Dict[int, ast.expr] = {}
+                for arg in node.args + [kw.value for kw in node.keywords]:
+                    res.update(self.d(arg))
+                return res
+            raise JacobianUnavailable(f"Unable to differentiate '{name or ast.dump(node.func)}'.")
+        du = self.d(node.args[0])
+        if not self.symbolic:
+            return du
+        outer = _DERIVATIVES[name](copy.deepcopy(node.args[0]))
+        return {j: _mul(outer, e) for j, e in du.items()}
+
+    def _assign(self, key: str, value: ast.expr) -> List[ast.stmt]:
+        dv = self.d(value)
+        self.deps[key] = set(dv)
+        if not self.symbolic:
+            return []
+        return [
+            ast.Assign(targets=[ast.Name(id=self.dname(key, j), ctx=ast.Store())], value=e)
+            for j, e in sorted(dv.items())
+        ]
+
+    def _new_array(self, value: ast.expr) -> Optional[int]:
+        if (
+            isinstance(value, ast.BinOp)
+            and isinstance(value.op, ast.Mult)
+            and isinstance(value.left, ast.List)
+            and all(_literal(elt) == 0 for elt in value.left.elts)
+            and isinstance(_literal(value.right), int)
+        ):
+            return len(value.left.elts) * _literal(value.right)
+        if (
+            isinstance(value, ast.Call)
+            and _func_name(value.func) == "zeros"
+            and len(value.args) == 1
+            and isinstance(_literal(value.args[0]), int)
+        ):
+            return _literal(value.args[0])
+        return None
+
+    def statements(self, body: List[ast.stmt]) -> List[ast.stmt]:
+        out: List[ast.stmt] = []
+        for stmt in body:
+            if self.returned is not None:
+                raise JacobianUnavailable("Unreachable code after return.")
+            if isinstance(stmt, ast.AugAssign):
+                stmt = ast.Assign(
+                    targets=[copy.deepcopy(stmt.target)],
+                    value=ast.BinOp(
+                        left=ast.copy_location(copy.deepcopy(stmt.target), stmt.target),
+                        op=stmt.op,
+                        right=stmt.value,
+                    ),
+                )
+                stmt.targets[0].ctx = ast.Store()
+                stmt.value.left.ctx = ast.Load()
+            if isinstance(stmt, ast.Assign):
+                if len(stmt.targets) != 1:
+                    raise JacobianUnavailable("Chained assignment is not supported.")
+                target = stmt.targets[0]
+                if isinstance(target, ast.Name):
+                    length = self._new_array(stmt.value)
+                    if length is not None:
+                        self.arrays[target.id] = length
+                        for i in range(length):
+                            self.deps[f"{target.id}[{i:d}]"] = set()
+                        self.deps.pop(target.id, None)
+                    else:
+                        out.extend(self._assign(target.id, stmt.value))
+                elif isinstance(target, ast.Subscript) and self._element(target) is not None:
+                    out.extend(self._assign(self._element(target), stmt.value))
+                else:
+                    raise JacobianUnavailable(f"Unsupported assignment: {ast.dump(target)}")
+                out.append(stmt)
+            elif isinstance(stmt, ast.If):
+                out.append(self._if(stmt))
+            elif isinstance(stmt, ast.Return):
+                if not (isinstance(stmt.value, ast.Name) and stmt.value.id in self.arrays):
+                    raise JacobianUnavailable("diffeq must return dydt.")
+                self.returned = stmt.value.id
+            elif isinstance(stmt, ast.Pass):
+                continue
+            else:
+                raise JacobianUnavailable(f"Unsupported statement: {type(stmt).__name__}")
+        return out
+
+    def _if(self, stmt: ast.If) -> ast.If:
+        if self._depends(stmt.test):
+            raise JacobianUnavailable("Conditions must not depend on y.")
+        saved = {key: set(value) for key, value in self.deps.items()}
+        body = self.statements(stmt.body)
+        deps_body, self.deps = self.deps, saved
+        orelse = self.statements(stmt.orelse)
+        deps_orelse = self.deps
+        if self.returned is not None:
+            raise JacobianUnavailable("diffeq must return dydt at the end.")
+        merged = {
+            key: deps_body.get(key, set()) | deps_orelse.get(key, set())
+            for key in set(deps_body) | set(deps_orelse)
+        }
+        if self.symbolic:
+            for branch, deps in ((body, deps_body), (orelse, deps_orelse)):
+                for key, union in merged.items():
+                    for j in sorted(union - deps.get(key, set())):
+                        branch.append(
+                            ast.Assign(
+                                targets=[ast.Name(id=self.dname(key, j), ctx=ast.Store())],
+                                value=ast.Constant(value=0.0),
+                            )
+                        )
+        self.deps = merged
+        return ast.If(test=stmt.test, body=body or [ast.Pass()], orelse=orelse)
+
+    def nonzeros(self) -> List[Tuple[int, int]]:
+        if self.returned is None:
+            raise JacobianUnavailable("diffeq must return dydt.")
+        if self.arrays[self.returned] != self.n_species:
+            raise JacobianUnavailable("len(dydt) must be equal to len(y).")
+        return [
+            (i, j)
+            for i in range(self.n_species)
+            for j in sorted(self.deps[f"{self.returned}[{i:d}]"])
+        ]
+
+
+def _reads(funcdef: ast.FunctionDef, name: str) -> bool:
+    return any(
+        isinstance(node, ast.Subscript)
+        and isinstance(node.ctx, ast.Load)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == name
+        for node in ast.walk(funcdef)
+    )
+
+
+def _strip_unused(body: List[ast.stmt], name: str) -> List[ast.stmt]:
+    """Remove the assignments to an array whose elements are never read."""
+    stripped: List[ast.stmt] = []
+    for stmt in body:
+        if isinstance(stmt, ast.If):
+            stmt.body = _strip_unused(stmt.body, name) or [ast.Pass()]
+            stmt.orelse = _strip_unused(stmt.orelse, name)
+        elif isinstance(stmt, ast.Assign) and any(
+            isinstance(node, ast.Name) and node.id == name
+            for target in stmt.targets
+            for node in ast.walk(target)
+        ):
+            continue
+        stripped.append(stmt)
+    return stripped
+
+
+def _jacobian_body(
+    diffeq: Callable, C: ModuleType, V: ModuleType
+) -> Tuple[Optional[List[ast.stmt]], List[Tuple[int, int]], List[str], Optional[str]]:
+    funcdef = parse_diffeq(diffeq, C, V)
+    if any(isinstance(node, ast.Name) and node.id == "self" for node in ast.walk(funcdef)):
+        raise JacobianUnavailable("'self' cannot be used in the rate equations.")
+    n_species = len(V.NAMES)
+    try:
+        differentiator = _Differentiator(n_species)
+        body = differentiator.statements(copy.deepcopy(funcdef).body)
+        nonzeros = differentiator.nonzeros()
+    except JacobianUnavailable as e:
+        # The sparsity pattern can still be used to reduce finite differences.
+        differentiator = _Differentiator(n_species, symbolic=False)
+        differentiator.statements(copy.deepcopy(funcdef).body)
+        return None, differentiator.nonzeros(), [], str(e)
+    if not _reads(funcdef, differentiator.returned):
+        body = _strip_unused(body, differentiator.returned)
+    names = [differentiator.dname(f"{differentiator.returned}[{i:d}]", j) for i, j in nonzeros]
+    return body, nonzeros, names, None
+
+
+def _assemble(nonzeros: List[Tuple[int, int]], names: List[str], n: int, numba: bool):
+    statements = [f"_J = _np.zeros(({n:d}, {n:d}))"]
+    if numba:
+        statements.extend(f"_J[{i:d}, {j:d}] = {name}" for (i, j), name in zip(nonzeros, names))
+    elif nonzeros:
+        rows, cols = (list(idx) for idx in zip(*nonzeros))
+        statements.append(f"_J[{rows}, {cols}] = [{', '.join(names)}]")
+    statements.append("return _J")
+    return ast.parse("\n".join(statements)).body
+
+
+def compile_jacobian(
+    diffeq: Callable,
+    C: ModuleType,
+    V: ModuleType,
+    backend: str = "numpy",
+) -> Tuple[Optional[Callable], Optional[csc_matrix], Optional[str]]:
+    """
+    Generate the Jacobian matrix of DifferentialEquation.diffeq with respect to y.
+
+    Parameters
+    ----------
+    diffeq : callable f(self, t, y, *x)
+        DifferentialEquation.diffeq as written in set_model.py.
+
+    C, V : module
+        name2idx.parameters and name2idx.species.
+
+    backend : str (default: 'numpy')
+        'numba' compiles the Jacobian with numba, otherwise it is Python code.
+
+    Returns
+    -------
+    jac : callable jac(t, y, *x), optional
+        Dense Jacobian matrix, d(dydt)/dy, or None if the rate equations
+        could not be differentiated. `jac.nonzeros` holds the row and column
+        indices of the structurally nonzero entries and `jac.batch(t, y, x)`
+        returns their values for arrays of parameter sets, i.e., y[i] and x[k]
+        of shape (n_sets,).
+
+    jac_sparsity : scipy.sparse.csc_matrix, optional
+        Sparsity structure of the Jacobian matrix, or None if it is unknown.
+
+    reason : str, optional
+        Why `jac` or `jac_sparsity` is not available.
+
+    """
+    try:
+        body, nonzeros, names, reason = _jacobian_body(diffeq, C, V)
+    except (JacobianUnavailable, ValueError, OSError, TypeError) as e:
+        return None, None, str(e)
+    n_species = len(V.NAMES)
+    sparsity = np.zeros((n_species, n_species), dtype=bool)
+    for i, j in nonzeros:
+        sparsity[i, j] = True
+    jac_sparsity = csc_matrix(sparsity)
+    if body is None:
+        return None, jac_sparsity, reason
+    module = ast.parse(_NUMBA_TEMPLATE if backend == "numba" else _PYTHON_TEMPLATE)
+    kernel = module.body[0]
+    dense = copy.deepcopy(body) + _assemble(nonzeros, names, n_species, backend == "numba")
+    if backend == "numba":
+        kernel.body = dense
+    else:
+        kernel.body = [_NumpyPow().visit(stmt) for stmt in dense]
+    batch = ast.parse("def _batch(t, y, x):\n    pass").body[0]
+    batch.body = [UniformConditions().visit(stmt) for stmt in body]
+    batch.body.append(ast.parse(f"return [{', '.join(names)}]").body[0])
+    module.body.append(batch)
+    namespace = _exec(module, diffeq, _namespace(diffeq))
+    if backend == "numba":
+        import numba
+
+        namespace["_kernel"] = numba.njit(error_model="numpy")(namespace["_kernel"])
+    jac = namespace["jac"]
+    jac.__qualname__ = diffeq.__qualname__.replace("diffeq", "jac")
+    rows, cols = np.array(nonzeros, dtype=int).reshape(-1, 2).T
+    jac.nonzeros = (rows, cols)
+    jac.batch = namespace["_batch"]
+    return jac, jac_sparsity, None
@@ -0,0 +1,84 @@
+from typing import Callable, List, Optional
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from .batch import solve_batch
+
+__all__ = ["solve_ode"]
+
+# Implicit methods that use the Jacobian matrix
+_JAC_METHODS = ("BDF", "Radau", "LSODA")
+
+
+def solve_ode(
+    diffeq: Callable,
+    y0: List[float],
+    t: range,
+    f_params: tuple,
+    method: str = "BDF",
+    options: Optional[dict] = None,
+):
+    """
+    Solve a system of ordinary differential equations
+    using scipy.integrate.solve_ivp.
+
+    Parameters
+    ----------
+    diffeq : callable f(t, y, *x)
+        Right-hand side of the differential equation. If it provides `jac`
+        and `jac_sparsity` (see compile_diffeq), they are passed to implicit
+        solvers; `jac` is not used while reaction rates are perturbed.
+
+    y0 : array
+        Initial condition on y (can be a vector). If y0 has shape
+        (n_species, n_sets), parameter sets are integrated together
+        (see solve_batch).
+
+    t : array
+        A sequence of time points for which to solve for y.
+
+    f_params : tuple
+        Model parameters: tuple(x).
+
+    method : str (default: "BDF")
+        Integration method to use.
+
+    options : dict, optional
+        Options passed to a chosen solver.
+
+    Returns
+    -------
+    sol : OdeResult
+        Represents the solution of ODE, or None if the integration failed.
+
+    """
+    if options is None:
+        options = {}
+    options.setdefault("rtol", 1e-8)
+    options.setdefault("atol", 1e-8)
+    if np.ndim(y0) == 2:
+        return solve_batch(diffeq, y0, t, f_params, method, options)
+    if method in _JAC_METHODS:
+        jac = getattr(diffeq, "jac", None)
+        perturbation = getattr(getattr(diffeq, "__self__", None), "perturbation", None)
+        if jac is not None and not perturbation:
+            options.setdefault("jac", jac)
+        jac_sparsity = getattr(diffeq, "jac_sparsity", None)
+        if jac_sparsity is not None and method != "LSODA":
+            options.setdefault("jac_sparsity", jac_sparsity)
+    # Kernels generated by compile_diffeq convert model parameters only once.
+    pack = getattr(diffeq, "pack", None)
+    try:
+        sol = solve_ivp(
+            diffeq,
+            (t[0], t[-1]),
+            y0,
+            method=method,
+            t_eval=t,
+            args=f_params if pack is None else pack(f_params),
+            **options,
+        )
+        return sol if sol.success else None
+    except ValueError:
+        return None
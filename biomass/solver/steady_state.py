@@ -0,0 +1,368 @@
+"""
+Steady-state computation without long time integration.
+
+A steady state of dy/dt = f(y) that is reached from y0 satisfies f(y) = 0
+together with the conservation laws of the network, L y = L y0, where the
+rows of L span the left null space of the Jacobian matrix. The square system
+
+    G(y) = f(y) + L^T (L y - L y0) = 0
+
+is solved by Newton's method starting from a prediction based on the
+nearest steady states computed so far in this process (see
+SteadyStateCache), then by pseudo-transient continuation (implicit Euler
+steps of increasing size) from y0. A root is accepted only if it is
+nonnegative, satisfies the conservation laws and is linearly stable on the
+conservation subspace; otherwise the system is integrated until the
+relative change becomes smaller than eps.
+"""
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .ode import solve_ode
+
+__all__ = ["SteadyStateCache", "find_steady_state", "steady_state_cache"]
+
+
+class SteadyStateCache(object):
+    """
+    Recently found steady states with least-recently-used eviction.
+
+    Entries are keyed by the vector of model parameters followed by the
+    initial values. Besides exact lookups, the cache returns the entries
+    closest to a new key in relative distance, which serve as starting
+    points of Newton's method.
+
+    Parameters
+    ----------
+    maxsize : int (default: 256)
+        Maximum number of steady states kept.
+
+    """
+
+    def __init__(self, maxsize: int = 256):
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer.")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: np.ndarray) -> Optional[np.ndarray]:
+        """Steady state stored for exactly this key, or None."""
+        with self._lock:
+            entry = self._entries.get(key.tobytes())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key.tobytes())
+            return entry[1].copy()
+
+    def nearest(self, key: np.ndarray, k: int = 2) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Up to k (key, steady state) pairs closest to key, nearest first."""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry[0].shape == key.shape]
+            if not entries:
+                return []
+            keys = np.array([entry[0] for entry in entries])
+            scale = np.abs(keys) + np.abs(key)
+            scale[scale == 0] = 1.0
+            distance = np.sum(((keys - key) / scale) ** 2, axis=1)
+            order = np.argsort(distance)[:k]
+            self._entries.move_to_end(entries[order[0]][0].tobytes())
+            return [(entries[i][0], entries[i][1].copy()) for i in order]
+
+    def put(self, key: np.ndarray, steady_state: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key.tobytes()] = (key.copy(), steady_state.copy())
+            self._entries.move_to_end(key.tobytes())
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Per-process caches, one for each system of rate equations and tolerance.
+_caches: Dict[Tuple[Callable, float], SteadyStateCache] = {}
+
+
+def steady_state_cache(diffeq: Callable, eps: float = 1e-6) -> SteadyStateCache:
+    """
+    Cache of steady states found by find_steady_state.
+
+    Parameters
+    ----------
+    diffeq : callable f(t, y, *x)
+        Right-hand side of the differential equation.
+
+    eps : float (default: 1e-6)
+        Tolerance used to find the steady states.
+
+    Returns
+    -------
+    cache : SteadyStateCache
+
+    """
+    key = (inspect.unwrap(getattr(diffeq, "__func__", diffeq)), eps)
+    return _caches.setdefault(key, SteadyStateCache())
+
+
+def _rhs(diffeq: Callable, f_params: tuple) -> Callable[[np.ndarray], np.ndarray]:
+    pack = getattr(diffeq, "pack", None)
+    args = f_params if pack is None else pack(f_params)
+    return lambda y: np.asarray(diffeq(0.0, y, *args), dtype=float)
+
+
+def _jacobian(diffeq: Callable, f_params: tuple, rhs: Callable) -> Tuple[Callable, bool]:
+    """Jacobian matrix J(y, f(y)) and whether it is exact."""
+    jac = getattr(diffeq, "jac", None)
+    if jac is not None and not getattr(getattr(diffeq, "__self__", None), "perturbation", None):
+        return (lambda y, fy: jac(0.0, y, *f_params)), True
+
+    def finite_difference(y: np.ndarray, fy: np.ndarray) -> np.ndarray:
+        J = np.empty((len(y), len(y)))
+        for j in range(len(y)):
+            h = np.sqrt(np.finfo(float).eps) * max(1.0, abs(y[j]))
+            y_step = y.copy()
+            y_step[j] += h
+            J[:, j] = (rhs(y_step) - fy) / h
+        return J
+
+    return finite_difference, False
+
+
+def _conservation_laws(
+    rhs: Callable, jacobian: Callable, y0: np.ndarray, tol: float
+) -> np.ndarray:
+    """Orthonormal rows spanning the common left null space of J at several points."""
+    rng = np.random.default_rng(0)
+    scale = np.abs(y0) + 1.0
+    points = [y0] + [scale * rng.uniform(0.5, 1.5, len(y0)) for _ in range(2)]
+    stacked = np.hstack([jacobian(y, rhs(y)) for y in points])
+    if not np.isfinite(stacked).all():
+        raise FloatingPointError
+    u, s, _ = np.linalg.svd(stacked)
+    rank = int(np.sum(s > tol * max(s[0], 1.0)))
+    return u[:, rank:].T
+
+
+def _scaled_residual(fy: np.ndarray, y: np.ndarray, eps: float) -> float:
+    return float(np.max(np.abs(fy) / (np.abs(y) + eps)))
+
+
+def _is_stable(J: np.ndarray, L: np.ndarray) -> bool:
+    # Basis of the subspace in which trajectories evolve, i.e., null space of L.
+    if len(L):
+        _, _, vt = np.linalg.svd(L)
+        Q = vt[len(L) :].T
+    else:
+        Q = np.eye(len(J))
+    if Q.shape[1] == 0:
+        return True
+    return bool(np.max(np.linalg.eigvals(Q.T @ J @ Q).real) < 0)
+
+
+def _conserved(y: np.ndarray, L: np.ndarray, c: np.ndarray, eps: float) -> bool:
+    return np.max(np.abs(L @ y - c), initial=0.0) <= eps * max(np.max(np.abs(c), initial=0.0), 1.0)
+
+
+def _accept(y, rhs, jacobian, L, c, eps) -> bool:
+    fy = rhs(y)
+    return (
+        np.isfinite(y).all()
+        and np.min(y) >= -eps
+        and _scaled_residual(fy, y, eps) < eps
+        and _conserved(y, L, c, eps)
+        and _is_stable(jacobian(y, fy), L)
+    )
+
+
+def _newton(y, rhs, jacobian, L, c, eps, maxiter: int = 50) -> Optional[np.ndarray]:
+    """
+    Damped Newton iteration on G(y) = f(y) + L^T (L y - c). Returns the last
+    iterate, or None if G is not finite there.
+    """
+
+    def G(y: np.ndarray) -> np.ndarray:
+        return rhs(y) + L.T @ (L @ y - c)
+
+    g = G(y)
+    if not np.isfinite(g).all():
+        return None
+    for _ in range(maxiter):
+        if _scaled_residual(g, y, eps) < 1e-3 * eps:
+            break
+        try:
+            dy = np.linalg.solve(jacobian(y, rhs(y)) + L.T @ L, -g)
+        except np.linalg.LinAlgError:
+            break
+        norm = np.linalg.norm(g)
+        lam = 1.0
+        while lam > 1e-4:
+            # Concentrations are kept nonnegative.
+            y_new = np.maximum(y + lam * dy, 0.0)
+            g_new = G(y_new)
+            if np.isfinite(g_new).all() and np.linalg.norm(g_new) < (1 - 1e-4 * lam) * norm:
+                break
+            lam *= 0.5
+        else:
+            break  # No further decrease, e.g., because of rounding errors.
+        y, g = y_new, g_new
+    return y
+
+
+def _ptc(y, rhs, jacobian, L, eps, dt: float = 1e-3, maxiter: int = 500) -> Optional[np.ndarray]:
+    """Pseudo-transient continuation: implicit Euler steps with growing dt."""
+    identity = np.eye(len(y))
+    fy = rhs(y)
+    if not np.isfinite(fy).all():
+        return None
+    for _ in range(maxiter):
+        if _scaled_residual(fy, y, eps) < 1e-3 * eps:
+            return y
+        try:
+            dy = np.linalg.solve(identity / dt - jacobian(y, fy), fy)
+        except np.linalg.LinAlgError:
+            dy = np.full_like(y, np.nan)
+        # Exact steps conserve L y; rounding errors are amplified by large dt.
+        y_new = y + dy - L.T @ (L @ dy)
+        if np.isfinite(y_new).all() and np.min(y_new) >= -eps:
+            y_new = np.maximum(y_new, 0.0)
+            f_new = rhs(y_new)
+            if np.isfinite(f_new).all():
+                # Switched evolution relaxation, growing dt at least geometrically
+                # while the residual decreases.
+                ratio = np.linalg.norm(fy) / max(np.linalg.norm(f_new), 1e-300)
+                dt = min(dt * (max(ratio, 1.5) if ratio >= 1 else ratio), 1e12)
+                y, fy = y_new, f_new
+                continue
+        dt *= 0.1
+        if dt < 1e-12:
+            return None
+    return y if _scaled_residual(fy, y, eps) < eps else None
+
+
+def _predict(neighbors: list, key: np.ndarray) -> List[np.ndarray]:
+    """
+    Starting points of Newton's method: a secant prediction along the steady
+    states of the two nearest keys, then the steady state of the nearest key.
+    """
+    guesses = []
+    if len(neighbors) == 2:
+        (key1, y1), (key2, y2) = neighbors
+        direction = key1 - key2
+        norm = float(direction @ direction)
+        if norm > 0:
+            s = float(np.clip((key - key1) @ direction / norm, -1.0, 1.0))
+            guesses.append(y1 + s * (y1 - y2))
+    if neighbors:
+        guesses.append(neighbors[0][1])
+    return guesses
+
+
+def _integrate(diffeq, y0, f_params, eps, solveode) -> List[float]:
+    while True:
+        sol = solveode(diffeq, y0, range(2), f_params)
+        if sol is None or np.max(np.abs((sol.y[:, -1] - y0) / (np.array(y0) + eps))) < eps:
+            break
+        else:
+            y0 = sol.y[:, -1].tolist()
+
+    return [] if sol is None else sol.y[:, -1].tolist()
+
+
+def _solve(diffeq, y0: np.ndarray, f_params: tuple, eps: float) -> Optional[np.ndarray]:
+    # Perturbed reaction rates are not part of the key.
+    perturbed = bool(getattr(getattr(diffeq, "__self__", None), "perturbation", None))
+    cache = steady_state_cache(diffeq, eps)
+    key = np.concatenate((np.asarray(f_params, dtype=float), y0))
+    if not perturbed:
+        y = cache.get(key)
+        if y is not None:
+            return y
+    rhs = _rhs(diffeq, f_params)
+    jacobian, exact = _jacobian(diffeq, f_params, rhs)
+    L = _conservation_laws(rhs, jacobian, y0, 1e-10 if exact else 1e-6)
+    c = L @ y0
+
+    def solutions():
+        for guess in _predict(cache.nearest(key), key):
+            y = _newton(np.maximum(guess, 0.0), rhs, jacobian, L, c, eps)
+            if y is None:
+                continue
+            yield y
+            # Newton's method stalls where concentrations reach zero; continue
+            # with time steps from the last iterate, which conserve L y.
+            if _conserved(y, L, c, eps):
+                with np.errstate(divide="ignore"):
+                    dt = float(np.clip(1.0 / _scaled_residual(rhs(y), y, eps), 1e-3, 1e12))
+                yield _ptc(y, rhs, jacobian, L, eps, dt)
+        yield _ptc(y0.copy(), rhs, jacobian, L, eps)
+
+    for y in solutions():
+        if y is not None and _accept(y, rhs, jacobian, L, c, eps):
+            # Traces far below the tolerances of the integrator can become
+            # negative in subsequent simulations, where rate laws are undefined.
+            y[y < eps ** 2] = 0.0
+            if not perturbed:
+                cache.put(key, y)
+            return y
+    return None
+
+
+def find_steady_state(
+    diffeq: Callable,
+    y0: List[float],
+    f_params: tuple,
+    eps: float = 1e-6,
+    solveode: Callable = solve_ode,
+) -> list:
+    """
+    Find the steady state reached from y0.
+
+    Parameters
+    ----------
+    diffeq : callable f(t, y, *x)
+        Right-hand side of the differential equation.
+
+    y0 : array
+        Initial condition on y, or an array of shape (n_species, n_sets)
+        for a stack of parameter sets.
+
+    f_params : tuple
+        Model parameters.
+
+    eps : float (default: 1e-6)
+        Tolerance on the regularized relative derivative, |dy/dt| / (|y| + eps).
+
+    solveode : callable (default: solve_ode)
+        Integrator used if the steady state cannot be found by root finding.
+
+    Returns
+    -------
+    y0 : list
+        Steady state concentrations of all species, or an empty list if the
+        integration failed.
+
+    """
+    y0 = np.asarray(y0, dtype=float)
+    # Parameter sets are solved one by one; integration is done for all of them.
+    stack = y0[:, :, None] if y0.ndim == 2 else y0[:, None, None]
+    params = [np.broadcast_to(np.asarray(p, dtype=float), stack.shape[1:2]) for p in f_params]
+    steady_states = []
+    with np.errstate(all="ignore"):
+        for s in range(stack.shape[1]):
+            try:
+                y = _solve(diffeq, stack[:, s, 0], tuple(float(p[s]) for p in params), eps)
+            except (FloatingPointError, np.linalg.LinAlgError, ValueError):
+                y = None
+            if y is None:
+                return _integrate(diffeq, y0.tolist(), f_params, eps, solveode)
+            steady_states.append(y)
+    return np.stack(steady_states, axis=-1).reshape(y0.shape).tolist()
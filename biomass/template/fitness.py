@@ -1,6 +1,10 @@
+from functools import partial
+
 import numpy as np
 from scipy.spatial.distance import cosine
 
+from biomass.solver import SimulationContext
+
 from .observable import observables, ExperimentalData, NumericalSimulation
 from .set_search_param import SearchParam
 
@@ -15,24 +19,157 @@ def _compute_objval_cos(sim_data, exp_data):
     return cosine(sim_data, exp_data)
 
 
-def _diff_sim_and_exp(sim_matrix, exp_dict, exp_timepoint, conditions, sim_norm_max):
-    sim_val = []
-    exp_val = []
+def _objective_timepoints(sim, exp):
+    """Time points used by the objective function, or None if all time points are needed."""
+    timepoints = [sim.t[0]]
+    for i, obs_name in enumerate(observables):
+        if exp.experiments[i] is not None:
+            timepoints.extend(exp.get_timepoint(obs_name))
+            if sim.normalization:
+                if sim.normalization[obs_name]["timepoint"] is None:
+                    return None  # Normalized by the maximum over time
+                timepoints.append(sim.normalization[obs_name]["timepoint"])
+    return timepoints if len(set(timepoints)) > 1 else None
+
+
+def _objective_simulation():
+    """NumericalSimulation reused by the objective function in each thread."""
+    sim = NumericalSimulation()
+    exp = ExperimentalData()
+    exp.set_data()
+    # Simulate only at the time points compared with experimental data
+    timepoints = _objective_timepoints(sim, exp)
+    if timepoints is not None:
+        sim.set_timepoints(timepoints)
+    return sim
+
+
+def _condition_simulation(condition):
+    """NumericalSimulation of a single condition, reused in each thread."""
+    sim = _objective_simulation()
+    sim.conditions = [condition]
+    sim.simulations = np.empty((len(observables), len(sim.t), 1))
+    return sim
+
+
+class _Comparison(object):
+    """Experimental data and the indices of sim.simulations compared with them"""
+
+    def __init__(self, sim, exp):
+        self.terms = []
+        for i, obs_name in enumerate(observables):
+            if exp.experiments[i] is None:
+                continue
+            conditions = [c for c in sim.conditions if c in exp.experiments[i]]
+            if not sim.normalization:
+                (norm_t, norm_c) = (None, None)
+            else:
+                timepoint = sim.normalization[obs_name]["timepoint"]
+                norm_t = slice(None) if timepoint is None else sim.t.index(timepoint)
+                norm_c = np.array(
+                    [
+                        sim.conditions.index(c)
+                        for c in (sim.normalization[obs_name]["condition"] or sim.conditions)
+                    ]
+                )
+            self.terms.append(
+                (
+                    i,
+                    np.array([sim.t.index(t) for t in exp.get_timepoint(obs_name)], dtype=int),
+                    np.array([sim.conditions.index(c) for c in conditions], dtype=int),
+                    np.array([v for c in conditions for v in exp.experiments[i][c]], dtype=float),
+                    norm_t,
+                    norm_c,
+                )
+            )
+
+    def error(self, simulations):
+        """Distance between simulated values and experimental data"""
+        error = np.zeros(len(observables))
+        for (i, t_idx, c_idx, exp_val, norm_t, norm_c) in self.terms:
+            # Time points of each condition, one condition after another
+            sim_val = simulations[i][np.ix_(t_idx, c_idx)].ravel(order="F")
+            if norm_c is not None:
+                sim_val = sim_val / np.max(simulations[i][norm_t][..., norm_c])
+            error[i] = _compute_objval_rss(sim_val, exp_val)
+        return np.sum(error)
+
+
+class ObjectivePlan(object):
+    """
+    Everything the objective function needs apart from the simulations,
+    prepared once (see compile_objective).
+
+    Attributes
+    ----------
+    lower, width : numpy array
+        Lower bounds and widths of the search region on a logarithmic scale.
+
+    comparison : _Comparison
+        Flattened experimental data with the indices of the time points,
+        conditions and normalization of sim.simulations compared with them.
+
+    condition_comparisons : list of _Comparison
+        The same for each condition simulated alone by objective(..., bound=),
+        or empty if conditions cannot be simulated one by one.
+    """
 
-    for idx, condition in enumerate(conditions):
-        if condition in exp_dict.keys():
-            sim_val.extend(sim_matrix[list(map(int, exp_timepoint)), idx])
-            exp_val.extend(exp_dict[condition])
+    def __init__(self):
+        self.sp = SearchParam()
+        search_rgn = self.sp.get_region()
+        self.lower = search_rgn[0, :]
+        self.width = search_rgn[1, :] - search_rgn[0, :]
+        exp = ExperimentalData()
+        exp.set_data()
+        sim = _objective_simulation()
+        self.comparison = _Comparison(sim, exp)
+        # Normalized values and shared trajectories depend on all conditions
+        if not sim.normalization and sim.condition_tree is None and len(sim.conditions) > 1:
+            self.condition_comparisons = [
+                _Comparison(_condition_simulation(condition), exp) for condition in sim.conditions
+            ]
+        else:
+            self.condition_comparisons = []
 
-    return np.array(sim_val) / sim_norm_max, np.array(exp_val)
+    def update(self, indiv_gene):
+        """Model parameters and initial values of genes (see SearchParam.gene2val)"""
+        return self.sp.update(10 ** (indiv_gene * self.width + self.lower))
 
 
-def objective(indiv_gene, *args):
-    """Define an objective function to be minimized"""
+_context = SimulationContext(_objective_simulation)
+
+_condition_contexts = [
+    SimulationContext(partial(_condition_simulation, condition))
+    for condition in NumericalSimulation.conditions
+]
+
+_plan = None
+
+
+def compile_objective():
+    """Prepare the ObjectivePlan of objective and objective_batch, e.g., in create().
+
+    Call it again after changing SearchParam or ExperimentalData.
+    """
+    global _plan
+    _plan = ObjectivePlan()
+    return _plan
+
+
+def _get_plan():
+    return _plan if _plan is not None else compile_objective()
+
+
+def objective(indiv_gene, *args, bound=None):
+    """Define an objective function to be minimized
+
+    If `bound` is given, conditions may be simulated one by one, returning
+    the error of those simulated so far, a lower bound of the objective
+    value, as soon as it exceeds `bound`.
+    """
+    plan = _get_plan()
     if len(args) == 0:
-        sp = SearchParam()
-        indiv = sp.gene2val(indiv_gene)
-        (x, y0) = sp.update(indiv)
+        (x, y0) = plan.update(indiv_gene)
     elif len(args) == 1:
         raise ValueError("not enough values to unpack (expected 2, got 1)")
     elif len(args) == 2:
@@ -40,42 +177,33 @@ def objective(indiv_gene, *args):
     else:
         raise ValueError("too many values to unpack (expected 2)")
 
-    sim = NumericalSimulation()
-    exp = ExperimentalData()
-
-    exp.set_data()
+    if bound is not None and plan.condition_comparisons:
+        error = 0.0
+        for context, comparison in zip(_condition_contexts, plan.condition_comparisons):
+            sim = context.sim
+            if sim.simulate(x, y0) is not None:
+                return 1e12
+            error += comparison.error(sim.simulations)
+            if error > bound:
+                break
+        return error  # < 1e12
 
+    sim = _context.sim
     if sim.simulate(x, y0) is None:
-        error = np.zeros(len(observables))
-        for i, obs_name in enumerate(observables):
-            if exp.experiments[i] is not None:
-                error[i] = _compute_objval_rss(
-                    *_diff_sim_and_exp(
-                        sim.simulations[i],
-                        exp.experiments[i],
-                        exp.get_timepoint(obs_name),
-                        sim.conditions,
-                        sim_norm_max=1
-                        if not sim.normalization
-                        else (
-                            np.max(
-                                sim.simulations[
-                                    observables.index(obs_name),
-                                    sim.normalization[obs_name]["timepoint"],
-                                    [sim.conditions.index(c) for c in sim.normalization[obs_name]["condition"]],
-                                ]
-                            )
-                            if sim.normalization[obs_name]["timepoint"] is not None
-                            else np.max(
-                                sim.simulations[
-                                    observables.index(obs_name),
-                                    :,
-                                    [sim.conditions.index(c) for c in sim.normalization[obs_name]["condition"]],
-                                ]
-                            )
-                        ),
-                    )
-                )
-        return np.sum(error)  # < 1e12
+        return plan.comparison.error(sim.simulations)  # < 1e12
     else:
-        return 1e12
\ No newline at end of file
+        return 1e12
+
+
+def objective_batch(indiv_genes):
+    """Objective values of individuals, simulated together by sim.simulate_batch"""
+    plan = _get_plan()
+    (X, Y0) = zip(*[plan.update(indiv_gene) for indiv_gene in indiv_genes])
+
+    sim = _context.sim
+
+    objval = np.full(len(indiv_genes), 1e12)
+    for k, simulations in enumerate(sim.simulate_batch(np.array(X), np.array(Y0))):
+        if not np.isnan(simulations).all():  # NaN if the simulation failed
+            objval[k] = plan.comparison.error(simulations)
+    return objval
@@ -50,17 +50,36 @@ class SearchParam(object):
         return x, y0
 
     def gene2val(self, indiv_gene):
-        search_rgn = self.get_region()
+        """Genes of an individual, or of a population (one per row), to values"""
+        search_rgn = self._get_search_rgn()
         indiv = 10 ** (indiv_gene * (search_rgn[1, :] - search_rgn[0, :]) + search_rgn[0, :])
 
         return indiv
 
     def val2gene(self, indiv):
-        search_rgn = self.get_region()
+        """Values of an individual, or of a population (one per row), to genes"""
+        search_rgn = self._get_search_rgn()
         indiv_gene = (np.log10(indiv) - search_rgn[0, :]) / (search_rgn[1, :] - search_rgn[0, :])
 
         return indiv_gene
 
+    def _get_search_rgn(self):
+        """get_region(), computed again only when the default values or
+        indices of the parameters and initial values change
+        """
+        key = (
+            tuple(param_values()),
+            tuple(initial_values()),
+            tuple(self.idx_params),
+            tuple(self.idx_initials),
+        )
+        cache = getattr(self, "_search_rgn", None)
+        if cache is None or cache[0] != key:
+            search_rgn = self.get_region()
+            search_rgn.flags.writeable = False
+            cache = self._search_rgn = (key, search_rgn)
+        return cache[1]
+
     def _init_search_param(self, x, y0):
         """Initialize search_param"""
         if len(self.idx_params) != len(set(self.idx_params)):
@@ -34,6 +34,7 @@ def main():
         url="https://github.com/okadalabipr/biomass",
         packages=find_packages(exclude=["tests"]),
         install_requires=requirements.splitlines(),
+        extras_require={"numba": ["numba"]},
         python_requires=">=3.7",
         keywords=["systems", "biology", "modeling", "optimization", "sensitivity", "analysis"],
         classifiers=[
@@ -1,47 +1,90 @@
-import os
-import shutil
-from distutils.dir_util import copy_tree
-from biomass import run_simulation
-
-# from biomass import run_analysis
-
-
-os.makedirs("biomass/models/Nakakuki_Cell_2010/out", exist_ok=True)
-copy_tree("tests/out", "biomass/models/Nakakuki_Cell_2010/out")
-
-from biomass.models import Nakakuki_Cell_2010
-
-model = Nakakuki_Cell_2010.create()
-
-for dir in ["figure", "simulation_data", "sensitivity_coefficients"]:
-    if os.path.isdir(os.path.join(model.path, dir)):
-        shutil.rmtree(os.path.join(model.path, dir))
-
-
-def test_run_simulation():
-    run_simulation(model, viz_type="average", stdev=True)
-    assert os.path.isfile(
-        os.path.join(
-            model.path,
-            "simulation_data",
-            "simulations_all.npy",
-        )
-    )
-
-
-"""
-def test_sensitivity_analysis():
-    run_analysis(
-        Nakakuki_Cell_2010, target='initial_condition', metric='integral'
-    )
-    assert os.path.isfile(
-        model.path
-        + '/sensitivity_coefficients/initial_condition/integral/sc.npy'
-    )
-"""
-
-
-def test_cleanup():
-    for dir in ["figure", "simulation_data", "out", "sensitivity_coefficients"]:
-        if os.path.isdir(os.path.join(model.path, dir)):
+import os
+import shutil
+from distutils.dir_util import copy_tree
+
+import numpy as np
+
+from biomass import run_simulation
+from biomass.solver import steady_state_cache
+
+# from biomass import run_analysis
+
+
+os.makedirs("biomass/models/Nakakuki_Cell_2010/out", exist_ok=True)
+copy_tree("tests/out", "biomass/models/Nakakuki_Cell_2010/out")
+
+from biomass.models import Nakakuki_Cell_2010
+
+model = Nakakuki_Cell_2010.create()
+
+for dir in ["figure", "simulation_data", "sensitivity_coefficients"]:
+    if os.path.isdir(os.path.join(model.path, dir)):
+        shutil.rmtree(os.path.join(model.path, dir))
+
+
+def test_rhs_backend():
+    y = np.random.rand(len(model.species))
+    x = model.pval()
+    for ligand in ["no_ligand", "EGF", "HRG"]:
+        x[model.parameters.index("Ligand")] = x[model.parameters.index(ligand)]
+        expected = model.sim.diffeq(1.0, y, *x)
+        compiled = Nakakuki_Cell_2010.create(rhs_backend="numpy")
+        assert np.allclose(compiled.sim.diffeq(1.0, y, *x), expected, rtol=1e-12)
+        Nakakuki_Cell_2010.create(rhs_backend="python")
+
+
+def test_steady_state():
+    x = model.pval()
+    x[model.parameters.index("Ligand")] = x[model.parameters.index("no_ligand")]
+    y0 = model.ival()
+    steady_state = model.sim._get_steady_state(model.sim.diffeq, y0, tuple(x))
+    assert len(steady_state) == len(model.species)
+    sol = model.sim._solveode(model.sim.diffeq, steady_state, range(100), tuple(x))
+    assert sol is not None
+    assert np.allclose(sol.y[:, -1], steady_state, rtol=1e-4, atol=1e-6)
+
+
+def test_steady_state_cache():
+    cache = steady_state_cache(model.sim.diffeq)
+    x = np.array(model.pval())
+    x[model.parameters.index("Ligand")] = x[model.parameters.index("no_ligand")]
+    y0 = model.ival()
+    expected = []
+    for scale in [1.0, 1.01, 1.02]:
+        cache.clear()
+        expected.append(model.sim._get_steady_state(model.sim.diffeq, y0, tuple(x * scale)))
+    cache.clear()
+    for scale, steady_state in zip([1.0, 1.01, 1.02], expected):
+        warm = model.sim._get_steady_state(model.sim.diffeq, y0, tuple(x * scale))
+        assert np.allclose(warm, steady_state, rtol=1e-4, atol=1e-6)
+    assert len(cache) == 3
+    assert cache.get(np.concatenate((x * 1.02, y0))) is not None
+
+
+def test_run_simulation():
+    run_simulation(model, viz_type="average", stdev=True)
+    assert os.path.isfile(
+        os.path.join(
+            model.path,
+            "simulation_data",
+            "simulations_all.npy",
+        )
+    )
+
+
+"""
+def test_sensitivity_analysis():
+    run_analysis(
+        Nakakuki_Cell_2010, target='initial_condition', metric='integral'
+    )
+    assert os.path.isfile(
+        model.path
+        + '/sensitivity_coefficients/initial_condition/integral/sc.npy'
+    )
+"""
+
+
+def test_cleanup():
+    for dir in ["figure", "simulation_data", "out", "sensitivity_coefficients"]:
+        if os.path.isdir(os.path.join(model.path, dir)):
             shutil.rmtree(os.path.join(model.path, dir))
\ No newline at end of file
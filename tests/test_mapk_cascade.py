@@ -1,11 +1,21 @@
+import json
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from biomass import optimize, optimize_continue, run_analysis, run_simulation
+from biomass.checkpoint import Checkpoint, CheckpointWriter, load_checkpoint
+from biomass.estimation.broker import BrokerServer, SocketBroker, SQLiteBroker, work
+from biomass.estimation.ga.memo import ObjectiveCache
+from biomass.estimation.ga.progress import ProgressLog
+from biomass.estimation.pool import WorkerPool
 from biomass.models import mapk_cascade
 from biomass.result import OptimizationResults
+from biomass.solver import SimulationContext
 
 model = mapk_cascade.create()
 
@@ -25,6 +35,248 @@ def test_simulate_successful():
     assert model.sim.simulate(x, y0) is None
 
 
+def test_simulate_batch():
+    x = np.array(model.pval())
+    y0 = model.ival()
+    X = x * np.array([[1.0], [0.9], [1.1]])
+    simulations = model.sim.simulate_batch(X, y0)
+    assert simulations.shape == (len(X),) + model.sim.simulations.shape
+    for i, params in enumerate(X):
+        assert model.sim.simulate(list(params), y0) is None
+        assert np.allclose(simulations[i], model.sim.simulations, rtol=1e-4, atol=1e-6)
+
+
+def test_set_timepoints():
+    x = model.pval()
+    y0 = model.ival()
+    assert model.sim.simulate(x, y0) is None
+    timepoints = [0, 300, 1200, 4500, 9000]
+    sim = type(model.sim)()
+    sim.set_timepoints(timepoints)
+    assert sim.simulate(x, y0) is None
+    assert sim.simulations.shape[1] == len(timepoints)
+    assert np.allclose(sim.simulations, model.sim.simulations[:, timepoints], rtol=1e-4, atol=1e-6)
+    assert len(type(model.sim).t) == model.sim.simulations.shape[1]
+
+
+def test_simulation_context():
+    x = np.array(model.pval())
+    y0 = model.ival()
+    X = x * np.array([[1.0], [0.9], [1.1], [1.2]])
+    expected = []
+    for params in X:
+        assert model.sim.simulate(list(params), y0) is None
+        expected.append(model.sim.simulations.copy())
+    context = SimulationContext(type(model.sim))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(
+            executor.map(lambda params: context.simulate(list(params), y0).copy(), X)
+        )
+    for simulations, res in zip(expected, results):
+        assert np.allclose(res, simulations, rtol=1e-4, atol=1e-6)
+    assert context.simulate(list(x), y0) is context.sim.simulations
+
+
+def test_obj_func_batch():
+    n_gene = len(model.sp.idx_params) + len(model.sp.idx_initials)
+    indiv_genes = np.random.rand(4, n_gene)
+    objval = model.obj_func_batch(indiv_genes)
+    assert objval.shape == (len(indiv_genes),)
+    for indiv_gene, value in zip(indiv_genes, objval):
+        assert np.isclose(value, model.obj_func(indiv_gene), rtol=1e-4)
+
+
+def test_objective_plan():
+    plan = mapk_cascade.fitness.compile_objective()
+    gene = np.random.rand(len(model.sp.idx_params) + len(model.sp.idx_initials))
+    assert np.allclose(plan.update(gene)[0], model.sp.update(model.sp.gene2val(gene))[0])
+    for (i, t_idx, c_idx, exp_val, _, _) in plan.comparison.terms:
+        assert len(exp_val) == len(t_idx) * len(c_idx)
+    assert plan.condition_comparisons == []  # A single condition
+
+
+def test_optimize_islands():
+    optimize(
+        model=model,
+        start=1,
+        options={
+            "popsize": 4,
+            "max_generation": 3,
+            "local_search_method": "mutation",
+            "n_children": 15,
+            "overwrite": True,
+            "islands": 2,
+            "migration_interval": 1,
+            "migration_size": 2,
+        },
+    )
+    with open(model.path + "/out/1/optimization.log") as f:
+        logs = f.readlines()
+    assert logs[-1][:13] == "Generation3: "
+    with open(model.path + "/out/1/optimization.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert records[-1]["generation"] == 3
+    checkpoint = load_checkpoint(model.path + "/out/1")
+    assert checkpoint.count_num == 3
+    assert 1 <= checkpoint.best_generation <= 3
+
+
+def test_broker(tmp_path):
+    server = BrokerServer(SQLiteBroker(str(tmp_path / "queue.db"), timeout=1.0), ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    broker = SocketBroker(server.server_address)
+    broker.put(range(1, 4))
+    # A worker that claims an index and stops sending heartbeats
+    assert broker.claim("lost") == (1, 1)
+    done = []
+    work(broker, lambda index, attempt: done.append((index, attempt)), interval=0.1)
+    assert done == [(2, 1), (3, 1), (1, 2)]
+    assert broker.finished()
+    assert not broker.heartbeat("lost", 1)
+    server.shutdown()
+    server.server_close()
+
+
+def test_worker_pool():
+    with WorkerPool(model, workers=2) as pool:
+        # Nested processes of DE in the workers of the pool
+        optimize(
+            model=model,
+            start=1,
+            end=2,
+            options={
+                "popsize": 3,
+                "max_generation": 2,
+                "local_search_method": "DE",
+                "maxiter": 1,
+                "workers": 2,
+                "overwrite": True,
+            },
+            pool=pool,
+        )
+    for i in range(1, 3):
+        with open(model.path + f"/out/{i:d}/optimization.log") as f:
+            logs = f.readlines()
+        assert logs[-1][:13] == "Generation2: "
+
+
+def test_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.dat")
+    with CheckpointWriter(path, 3, flush_interval=float("inf")) as checkpoint:
+        checkpoint.save_best(1, 2.0, [1.0, 2.0, 3.0])
+        checkpoint.save_count(2)
+        # Buffered until flushed
+        assert len(Checkpoint(path).records) == 0
+        checkpoint.flush()
+        checkpoint.save_best(3, 1.0, [4.0, 5.0, 6.0])
+    with open(path, "ab") as f:
+        f.write(b"\0" * 12)  # Interrupted write
+    with CheckpointWriter(path, 3, resume=True) as checkpoint:
+        checkpoint.save_count(4)
+    checkpoint = load_checkpoint(str(tmp_path))
+    assert checkpoint.count_num == 4
+    assert checkpoint.best_generation == 3
+    assert checkpoint.best_fitness == 1.0
+    assert np.array_equal(checkpoint.best_individual, [4.0, 5.0, 6.0])
+    assert np.array_equal(checkpoint.records[:, 0], [1, 3])
+
+
+def test_optimize_continue_exact(tmp_path):
+    optimize(
+        model=model,
+        start=1,
+        options={"popsize": 3, "max_generation": 2, "n_children": 10, "overwrite": True},
+    )
+    shutil.copytree(model.path + "/out/1", tmp_path / "1")
+    results = []
+    for _ in range(2):
+        shutil.rmtree(model.path + "/out/1")
+        shutil.copytree(tmp_path / "1", model.path + "/out/1")
+        optimize_continue(
+            model=model,
+            start=1,
+            options={"popsize": 3, "max_generation": 4, "n_children": 10},
+        )
+        with open(model.path + "/out/1/optimization.log") as f:
+            logs = f.readlines()
+        assert "Resuming the population of Generation2.\n" in logs
+        assert logs[-1][:13] == "Generation4: "
+        results.append((logs, np.load(model.path + "/out/1/population.npz")["population"]))
+    # Resumed from the same population and random state
+    assert results[0][0] == results[1][0]
+    assert np.array_equal(results[0][1], results[1][1])
+
+
+def test_progress_log(tmp_path):
+    path = str(tmp_path / "optimization.log")
+    with ProgressLog(path, mode="w", flush_interval=60.0, buffer_size=2) as log:
+        log.write("Generating the initial population. . .\n")
+        with open(path) as f:
+            assert f.read() == ""
+        log.generation(1, 1.5)
+        # Flushed by the background thread as the buffer is full
+        for _ in range(100):
+            with open(path) as f:
+                flushed = f.read()
+            if flushed:
+                break
+            time.sleep(0.05)
+        assert flushed.endswith("Generation1: Best Fitness = 1.500000e+00\n")
+        log.generation(2, 1.0)
+    with open(path) as f:
+        assert f.readlines() == [
+            "Generating the initial population. . .\n",
+            "Generation1: Best Fitness = 1.500000e+00\n",
+            "Generation2: Best Fitness = 1.000000e+00\n",
+        ]
+    with open(str(tmp_path / "optimization.jsonl")) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["generation"], r["best_fitness"]) for r in records] == [(1, 1.5), (2, 1.0)]
+
+
+def test_early_rejection():
+    gene = np.random.rand(len(model.sp.idx_params) + len(model.sp.idx_initials))
+    # A single condition is never cut short
+    assert model.obj_func(gene, bound=0.0) == model.obj_func(gene)
+    bounds = []
+
+    def evaluator(genes, bound=None):
+        bounds.append(bound)
+        return np.array([model.obj_func(gene, bound=bound) for gene in genes])
+
+    optimize(
+        model=model,
+        start=1,
+        options={
+            "popsize": 3,
+            "max_generation": 2,
+            "local_search_method": "mutation",
+            "n_children": 15,
+            "evaluator": evaluator,
+            "early_rejection": True,
+            "overwrite": True,
+        },
+    )
+    # The initial population is evaluated without bound, children with that of their parent
+    assert bounds[0] is None
+    assert len(bounds) > 1 and all(np.isfinite(bound) for bound in bounds[1:])
+
+
+def test_objective_cache():
+    obj_func = ObjectiveCache(model.obj_func, maxsize=2)
+    genes = np.random.rand(3, len(model.sp.idx_params) + len(model.sp.idx_initials))
+    objval = obj_func(genes[0])
+    assert obj_func(genes[0].copy()) == objval == model.obj_func(genes[0])
+    assert obj_func.cache_info() == (1, 1, 2, 1)
+    # The least recently used gene is discarded
+    obj_func(genes[1])
+    obj_func(genes[2])
+    obj_func(genes[0])
+    assert obj_func.cache_info() == (1, 4, 2, 2)
+    obj_func.cache_clear()
+    assert obj_func.cache_info() == (0, 0, 2, 0)
+
+
 def test_optimize():
     optimize(
         model=model,
@@ -35,6 +287,7 @@ def test_optimize():
             "max_generation": 3,
             "local_search_method": "mutation",
             "n_children": 15,
+            "threads": 2,
             "overwrite": True,
         },
     )
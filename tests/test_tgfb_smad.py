@@ -1,38 +1,100 @@
-import os
-import shutil
-import numpy as np
-
-from biomass.models import tgfb_smad
-from biomass import run_simulation
-
-
-model = tgfb_smad.create()
-
-
-for dir in ["figure", "simulation_data"]:
-    if os.path.isdir(os.path.join(model.path, dir)):
-        shutil.rmtree(os.path.join(model.path, dir))
-
-
-def test_simulate_successful():
-    x = model.pval()
-    y0 = model.ival()
-    assert model.sim.simulate(x, y0) is None
-
-
-def test_run_simulation():
-    run_simulation(model, viz_type="original")
-    simulated_value = np.load(
-        os.path.join(
-            model.path,
-            "simulation_data",
-            "simulations_original.npy",
-        )
-    )
-    assert np.isfinite(simulated_value).all()
-
-
-def test_cleanup():
-    for dir in ["figure", "simulation_data"]:
-        if os.path.isdir(os.path.join(model.path, dir)):
+import os
+import shutil
+import numpy as np
+
+from biomass.models import tgfb_smad
+from biomass.solver import Branch
+from biomass import run_simulation
+
+
+model = tgfb_smad.create()
+
+
+for dir in ["figure", "simulation_data"]:
+    if os.path.isdir(os.path.join(model.path, dir)):
+        shutil.rmtree(os.path.join(model.path, dir))
+
+
+def test_simulate_successful():
+    x = model.pval()
+    y0 = model.ival()
+    assert model.sim.simulate(x, y0) is None
+
+
+def test_rhs_backend():
+    x = model.pval()
+    y0 = model.ival()
+    assert model.sim.simulate(x, y0) is None
+    expected = model.sim.simulations.copy()
+    compiled = tgfb_smad.create(rhs_backend="numpy")
+    assert compiled.sim.diffeq.backend == "numpy"
+    x = compiled.pval()
+    y0 = compiled.ival()
+    assert compiled.sim.simulate(x, y0) is None
+    assert np.allclose(compiled.sim.simulations, expected, rtol=1e-6, atol=1e-8)
+    tgfb_smad.create(rhs_backend="python")
+    assert model.sim.diffeq.backend == "python"
+
+
+def test_jacobian():
+    x = model.pval()
+    y = np.array(model.ival()) + 1.0
+    jac = model.sim.diffeq.jac(0.0, y, *x)
+    assert jac.shape == (len(model.species), len(model.species))
+    for j in range(len(y)):
+        h = 1e-6 * max(1.0, abs(y[j]))
+        y_plus, y_minus = y.copy(), y.copy()
+        y_plus[j] += h
+        y_minus[j] -= h
+        approx = (
+            np.array(model.sim.diffeq(0.0, y_plus, *x))
+            - np.array(model.sim.diffeq(0.0, y_minus, *x))
+        ) / (2 * h)
+        assert np.allclose(jac[:, j], approx, rtol=1e-5, atol=1e-6)
+    sparsity = model.sim.diffeq.jac_sparsity.toarray()
+    assert not jac[~sparsity].any()
+
+
+def test_condition_tree():
+    def overexpress_smad2(x, y):
+        y[model.species.index("S2")] *= 2
+
+    model.sim.condition_tree = Branch(
+        "pretreatment",
+        children=tuple(
+            Branch(condition, time=100, update=overexpress_smad2 if condition == "Smad2OE" else None)
+            for condition in model.sim.conditions
+        ),
+    )
+    try:
+        x = model.pval()
+        y0 = model.ival()
+        solutions = model.sim.solve_conditions(x, y0)
+    finally:
+        del model.sim.condition_tree
+    assert sorted(solutions) == sorted(model.sim.conditions)
+    sol = model.sim._solveode(model.sim.diffeq, y0, model.sim.t, tuple(x))
+    assert np.allclose(solutions["WT"].y, sol.y, rtol=1e-4, atol=1e-6)
+    assert np.array_equal(solutions["Smad2OE"].y[:, :100], solutions["WT"].y[:, :100])
+    y = sol.y[:, 100].copy()
+    y[model.species.index("S2")] *= 2
+    sol = model.sim._solveode(model.sim.diffeq, y.tolist(), range(100, 601), tuple(x))
+    assert np.allclose(solutions["Smad2OE"].y[:, 100:], sol.y, rtol=1e-4, atol=1e-6)
+
+
+def test_run_simulation():
+    run_simulation(model, viz_type="original")
+    simulated_value = np.load(
+        os.path.join(
+            model.path,
+            "simulation_data",
+            "simulations_original.npy",
+        )
+    )
+    assert np.isfinite(simulated_value).all()
+
+
+def test_cleanup():
+    for dir in ["figure", "simulation_data"]:
+        if os.path.isdir(os.path.join(model.path, dir)):
             shutil.rmtree(os.path.join(model.path, dir))
\ No newline at end of file